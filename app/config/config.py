@@ -10,18 +10,34 @@ class Settings(BaseSettings):
     nextcloud_user: str = "empty"
     nextcloud_password: str = "empty"
     nextcloud_folder: str = "empty"
+    background_rotation_seconds: int = 300  # how long each slideshow photo is shown
 
     #API KEYS -----------------------------------------------------------
     openweather_api_key: str = "empty"
     crypto_api: str = "empty"
 
+    #UPSTREAM BASE URLS (overridable for benchmarks) -------------------
+    openweather_base_url: str = "https://api.openweathermap.org"
+    coingecko_base_url: str = "https://api.coingecko.com"
+    daily_word_feed_url: str = "https://www.merriam-webster.com/wotd/feed/rss2"
+
+    #ASSET PROXY (external images served from local disk) -------------
+    asset_proxy_dir: str = "data/assets"
+    asset_proxy_hosts: str = "assets.coingecko.com,coin-images.coingecko.com"
+    asset_proxy_max_mb: int = 50  # least recently served assets are deleted beyond this
+    asset_proxy_max_files: int = 2000
+
     #WEATHER -----------------------------------------------------------
     units: str = "metric"
+    # IANA timezone of the frames, decides when the daily word changes
+    timezone: str = "Europe/Berlin"
 
     #Crypto ---------------------------------------------------
     crypto_vs_currency: str = "usd"
     crypto_graph_history_days: int = 30
     crypto_coin_ids: str = "bitcoin,solana,ethereum,litecoin"
+    # "chartjs" draws the history chart in the browser, "sparkline" shows server-rendered SVGs
+    crypto_chart_mode: str = "chartjs"
 
     #First City - Ludwigsfelde
     first_city_weather_latitude: str = "52.30322"
@@ -39,6 +55,45 @@ class Settings(BaseSettings):
     #Countdown ---------------------------------------------------------
     countdown_date: str = "2026-09-31"  # YYYY-MM-DD
 
+    #Responses ---------------------------------------------------------
+    compression_min_bytes: int = 1024  # only compress API bodies above this size
+
+    #Caching ----------------------------------------------------------
+    weather_cache_seconds: int = 900  # matches the 15 min polling in weather.js
+    calendar_cache_seconds: int = 900  # matches the 15 min polling in calendar.js
+
+    #Frames ------------------------------------------------------------
+    frame_profiles_path: str = "frames.json"  # per-frame profiles, see README
+
+    #Admission control ------------------------------------------------
+    # Concurrent requests and queue length per request class
+    admission_interactive_concurrency: int = 16  # widget JSON, the page and static files
+    admission_interactive_queue: int = 64
+    admission_media_concurrency: int = 2  # background photos and proxied assets
+    admission_media_queue: int = 4
+    admission_admin_concurrency: int = 1  # /metrics and /api/debug/*
+    admission_admin_queue: int = 2
+    admission_queue_timeout_seconds: float = 5.0  # queued longer than this gets 503
+
+    #Upstream resilience ----------------------------------------------
+    request_deadline_seconds: float = 6.0  # time budget shared by all upstream calls of a request
+    breaker_window_size: int = 10  # recent calls per host the failure rate is computed over
+    breaker_min_calls: int = 4
+    breaker_failure_rate: float = 0.5
+    breaker_open_seconds: int = 60  # how long a failing host is skipped before probing it again
+
+    #Memory ------------------------------------------------------------
+    memory_budget_mb: int = 32  # budget shared by all in-memory caches
+    memory_spill_threshold_kb: int = 256  # larger images and feeds are spooled to disk
+    memory_spill_dir: str = "data/spill"  # empty uses the system temp dir (RAM on tmpfs)
+
+    #Startup -----------------------------------------------------------
+    preload_heavy_modules: bool = True  # import ics, nc_py_api, requests after the first request
+
+    #Warm-start snapshots ----------------------------------------------
+    snapshot_path: str = "data/snapshots.json"  # empty disables persistence
+    snapshot_interval_seconds: int = 300
+
 
     flask_port: int = 5000
     flask_debug: bool = False
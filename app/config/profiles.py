@@ -0,0 +1,126 @@
+import json
+import logging
+from typing import Dict, Optional
+from pydantic import BaseModel, Field, ValidationError
+from app.config.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class City(BaseModel):
+    """A weather location"""
+
+    name: str
+    latitude: str
+    longitude: str
+
+
+class FrameProfile(BaseModel):
+    """Per-frame configuration. Fields that are not set fall back to the global settings."""
+
+    frame_id: str = "default"
+    auth_key: Optional[str] = None
+
+    timezone: str = Field(default_factory=lambda: settings.timezone)
+
+    #WEATHER -----------------------------------------------------------
+    first_city: City = Field(default_factory=lambda: City(
+        name="Ludwigsfelde",
+        latitude=settings.first_city_weather_latitude,
+        longitude=settings.first_city_weather_longitude,
+    ))
+    second_city: City = Field(default_factory=lambda: City(
+        name="Leipzig",
+        latitude=settings.second_city_weather_latitude,
+        longitude=settings.second_city_weather_longitude,
+    ))
+
+    #Calendar ---------------------------------------------------
+    calendar_ical_url: str = Field(default_factory=lambda: settings.calendar_ical_url)
+    calendar_garbage_url: str = Field(default_factory=lambda: settings.calendar_garbage_url)
+    calendar_holidays_url: str = Field(default_factory=lambda: settings.calendar_holidays_url)
+
+    #Crypto ---------------------------------------------------
+    crypto_coin_ids: str = Field(default_factory=lambda: settings.crypto_coin_ids)
+    crypto_vs_currency: str = Field(default_factory=lambda: settings.crypto_vs_currency)
+    crypto_graph_history_days: int = Field(default_factory=lambda: settings.crypto_graph_history_days)
+    crypto_chart_mode: str = Field(default_factory=lambda: settings.crypto_chart_mode)
+
+    #Background ---------------------------------------------------
+    nextcloud_folder: str = Field(default_factory=lambda: settings.nextcloud_folder)
+
+    #Countdown ---------------------------------------------------------
+    countdown_date: str = Field(default_factory=lambda: settings.countdown_date)
+
+    @property
+    def calendars(self) -> Dict[str, str]:
+        return {
+            "personal": self.calendar_ical_url,
+            "holidays": self.calendar_holidays_url,
+            "garbage": self.calendar_garbage_url,
+        }
+
+
+def load_profiles(path: str) -> Dict[str, FrameProfile]:
+    """
+    Load frame profiles from a JSON file containing a list of profile objects.
+
+    Args:
+        path: Path to the JSON file (empty string for none)
+
+    Returns:
+        Dictionary of {frame_id: FrameProfile}
+    """
+    profiles = {}
+    if not path:
+        return profiles
+
+    try:
+        with open(path, encoding="utf-8") as f:
+            raw_profiles = json.load(f)
+    except FileNotFoundError:
+        return profiles
+    except (OSError, ValueError) as e:
+        logger.error("Could not read frame profiles from %s: %s", path, e)
+        return profiles
+
+    if not isinstance(raw_profiles, list):
+        logger.error("Frame profiles in %s must be a list of objects, using the default profile", path)
+        return profiles
+
+    for index, raw in enumerate(raw_profiles):
+        if not isinstance(raw, dict):
+            logger.error("Skipping frame profile #%d in %s: not an object", index, path)
+            continue
+        try:
+            profile = FrameProfile(**raw)
+        except (ValidationError, TypeError) as e:
+            logger.error("Invalid frame profile %s: %s", raw.get("frame_id"), e)
+            continue
+        profiles[profile.frame_id] = profile
+    return profiles
+
+
+profiles = load_profiles(settings.frame_profiles_path)
+
+
+def get_profile(frame_id: Optional[str] = None, auth_key: Optional[str] = None) -> FrameProfile:
+    """
+    Select the profile of the frame making a request.
+    A profile whose auth_key matches wins over the frame id.
+
+    Args:
+        frame_id: Frame id from the request (query parameter or cookie)
+        auth_key: The request's auth_key header
+
+    Returns:
+        The matching profile, or the default profile
+    """
+    if auth_key:
+        for profile in profiles.values():
+            if profile.auth_key and profile.auth_key == auth_key:
+                return profile
+    if frame_id and frame_id in profiles:
+        return profiles[frame_id]
+    # Built on every call so it always reflects the current settings
+    return FrameProfile()
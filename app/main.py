@@ -1,16 +1,18 @@
-from flask import Flask, render_template, request, redirect, jsonify, Response
+import time
+BOOT_START = time.perf_counter()
+
+from flask import Flask, render_template, request, redirect, jsonify, Response, g
 from app.config.config import settings
 import logging
-from app.modules.weather import (
-    get_weather_first_city,
-    get_weather_forecast_first_city,
-    get_weather_second_city,
-    get_weather_forecast_second_city,
-)
-from app.modules.calendar import return_calendar_events
-from app.modules.crypto import get_current_crypto_price, get_historical_crypto_price, get_coin_config
+from werkzeug.wsgi import ClosingIterator, wrap_file
+from app.config.profiles import FrameProfile, get_profile
+from app.modules.weather import get_current_weather, get_weather_forecast
+from app.modules.calendar import parse_since, return_calendar_events
+from app.modules.crypto import get_current_crypto_price, get_historical_crypto_price, get_coin_config, get_crypto_sparkline
 from app.modules.daily_word import return_daily_word
-from app.modules.nextcloud import get_random_image
+from app.modules.nextcloud import get_random_image, get_playlist, get_image, MAX_PLAYLIST_COUNT
+from app.modules.response_layer import apply_response_layer
+from app.modules import admission, asset_proxy, assets, hydration, memory, metrics, snapshot, sparkline, startup, timing, upstream
 
 app = Flask(
     __name__,
@@ -18,8 +20,47 @@ app = Flask(
     template_folder="templates",
 )
 
+app.json = timing.TimedJSONProvider(app)
+
 logger = logging.getLogger(__name__)
 
+snapshot.init_snapshots()
+assets.build_assets(app.static_folder)
+app.jinja_env.globals["asset_url"] = assets.asset_url
+startup.mark_app_ready(BOOT_START)
+
+@app.before_request
+def admit_request():
+    """Wait for a slot in the request's admission pool, or shed it with 503."""
+    pool = admission.get_pool(admission.classify(request.path))
+    if pool.acquire() is not None:
+        response = Response("Server busy, try again later", status=503, mimetype="text/plain")
+        response.headers["Retry-After"] = str(pool.retry_after())
+        response.headers["Cache-Control"] = "no-store"
+        return response
+    g.admission_pool = pool
+
+@app.after_request
+def release_admission_slot(response):
+    # Registered first so it runs last and sees the final response. The slot
+    # is freed once the body is sent, as images are streamed after this hook.
+    pool = g.pop("admission_pool", None)
+    if pool is None:
+        return response
+    if response.direct_passthrough:
+        # Werkzeug hands passed-through files to the server as they are, without the close callbacks
+        response.response = ClosingIterator(response.response, pool.release)
+    else:
+        response.call_on_close(pool.release)
+    return response
+
+@app.teardown_request
+def release_unanswered_admission_slot(exc):
+    # Requests that raised past the after_request hooks (e.g. in debug mode)
+    pool = g.pop("admission_pool", None)
+    if pool is not None:
+        pool.release()
+
 @app.before_request
 def require_auth_key():
     # logger.error("Request headers: %s", request.headers)
@@ -28,39 +69,119 @@ def require_auth_key():
     #     logger.error("Auth key is invalid")
     #     return redirect("https://ninawunder.com", code=302)
 
+def current_profile() -> FrameProfile:
+    """Return the profile of the frame making the current request."""
+    if "frame_profile" not in g:
+        frame_id = request.args.get("frame") or request.cookies.get("frame_id")
+        g.frame_profile = get_profile(frame_id, request.headers.get("auth_key"))
+    return g.frame_profile
+
+@app.before_request
+def start_request_timer():
+    g.request_start = metrics.now()
+    upstream.start_deadline(settings.request_deadline_seconds)
+    # The server is listening now, so load the heavy widget libraries off the request path
+    startup.start_preload()
+    # Opt-in profiling, e.g. /api/calendar?profile=1 with a valid auth_key header
+    if request.args.get("profile") == "1" and profiling_allowed():
+        timing.start_profiler()
+
+def profiling_allowed() -> bool:
+    """Only a configured auth_key unlocks profiling; the "empty" placeholder never does."""
+    auth_key = settings.auth_key
+    if not auth_key or auth_key == "empty":
+        return False
+    return request.headers.get("auth_key") == auth_key
+
+@app.after_request
+def add_response_layer(response):
+    return apply_response_layer(request, response)
+
+@app.after_request
+def record_request_latency(response):
+    start = g.get("request_start")
+    if start is not None:
+        elapsed = metrics.now() - start
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.request_latency.observe(elapsed, route, request.method, str(response.status_code))
+        startup.record_request(route, elapsed)
+        response.headers["Server-Timing"] = timing.get_server_timing_header(elapsed)
+    return response
+
+@app.after_request
+def return_profile(response):
+    report = timing.stop_profiler()
+    if report is None:
+        return response
+    profile_response = Response(report, mimetype="text/plain")
+    profile_response.headers["Cache-Control"] = "no-store"
+    return profile_response
+
 @app.route("/")
 def index():
-    return render_template("index.html", countdown_date=settings.countdown_date)
+    profile = current_profile()
+    if settings.flask_debug:
+        assets.rebuild_if_changed()
+    # Widgets render from whatever is already in memory; upstreams are never called here
+    with timing.phase("hydrate"):
+        initial_data = hydration.get_initial_data(profile)
+    response = Response(render_template(
+        "index.html", countdown_date=profile.countdown_date, initial_data=initial_data,
+        chart_mode=profile.crypto_chart_mode,
+    ))
+    # Remember the frame so the widget requests of this page use its profile
+    if request.args.get("frame"):
+        response.set_cookie("frame_id", profile.frame_id, max_age=365 * 24 * 3600, samesite="Lax")
+    return response
+
+
+@app.route("/static/dist/<filename>")
+def static_asset(filename):
+    """Serve a bundled, fingerprinted asset with immutable caching."""
+    return assets.serve_asset(request, filename)
+
+
+@app.route("/api/asset-proxy")
+def api_asset_proxy():
+    """Fetch an external widget asset once and redirect to its local, immutable URL."""
+    return asset_proxy.resolve(request)
+
+
+@app.route("/api/asset-proxy/<name>")
+def api_asset_proxy_file(name):
+    """Serve a proxied asset by its content hash."""
+    return asset_proxy.serve(name)
 
 
 #WEATHER -----------------------------------------------------------------------
 @app.route("/api/weather/first-city")
 def api_weather_first_city():
-    """Return weather JSON for Berlin using lat/lon."""
-    return get_weather_first_city()
+    """Return weather JSON for the frame's first city using lat/lon."""
+    return get_current_weather(current_profile().first_city)
 
 
 @app.route("/api/forecast/first-city")
 def api_forecast_first_city():
     """Return short-term weather forecast (3 items)."""
-    return get_weather_forecast_first_city()
+    return get_weather_forecast(current_profile().first_city)
 
 @app.route("/api/weather/second-city")
 def api_weather_second_city():
-    """Return weather JSON for Leipzig using lat/lon."""
-    return get_weather_second_city()
+    """Return weather JSON for the frame's second city using lat/lon."""
+    return get_current_weather(current_profile().second_city)
 
 @app.route("/api/forecast/second-city")
 def api_forecast_second_city():
     """Return short-term weather forecast (3 items)."""
-    return get_weather_forecast_second_city()
+    return get_weather_forecast(current_profile().second_city)
 
 
 #CALENDAR -----------------------------------------------------------------------
 @app.route("/api/calendar")
 def api_all_calendars():
-    """Return events from all calendars (personal, holidays, garbage)."""
-    return return_calendar_events()
+    """Return events from all calendars (personal, holidays, garbage), or their changes with ?since=<name>:<version>,..."""
+    profile = current_profile()
+    return return_calendar_events(profile.calendars, profile.timezone, parse_since(request.args.get("since")))
 
 
 #CRYPTO -----------------------------------------------------------------------
@@ -68,40 +189,115 @@ def api_all_calendars():
 def api_crypto_price():
     """
     Return current cryptocurrency prices from CoinGecko API.
-    Queries prices for: bitcoin, solana, ethereum, and litecoin.
+    Queries prices for the coins of the frame's profile.
     """
-    return get_current_crypto_price(settings.crypto_coin_ids, settings.crypto_vs_currency)
+    profile = current_profile()
+    return get_current_crypto_price(profile.crypto_coin_ids, profile.crypto_vs_currency)
 
 @app.route("/api/crypto-history/<coin_id>")
 def api_crypto_price_history_single(coin_id):
     """Get last 4 days of historical prices for a single cryptocurrency."""
-    return get_historical_crypto_price(coin_id, settings.crypto_vs_currency, settings.crypto_graph_history_days)
+    profile = current_profile()
+    return get_historical_crypto_price(coin_id, profile.crypto_vs_currency, profile.crypto_graph_history_days)
+
+@app.route("/api/crypto-sparkline/<coin_id>.svg")
+def api_crypto_sparkline(coin_id):
+    """Return the price history of a coin as an SVG sparkline, sized by ?w= and ?h=."""
+    profile = current_profile()
+    width = sparkline.clamp_size(request.args.get("w", type=int), sparkline.DEFAULT_WIDTH)
+    height = sparkline.clamp_size(request.args.get("h", type=int), sparkline.DEFAULT_HEIGHT)
+    return get_crypto_sparkline(
+        coin_id, profile.crypto_vs_currency, profile.crypto_graph_history_days, width, height,
+    )
 
 @app.route("/api/crypto-config")
 def api_crypto_config():
-    """Return frontend crypto config derived from environment."""
-    return get_coin_config()
+    """Return frontend crypto config derived from the frame's profile."""
+    return get_coin_config(current_profile().crypto_coin_ids)
 
 #DAILY WORD -----------------------------------------------------------------------
 @app.route("/daily-word")
 def daily_word():
-    return return_daily_word()
+    return return_daily_word(current_profile().timezone)
 
 
 #BACKGROUND -----------------------------------------------------------------------
 @app.route("/api/background")
 def api_background():
     """Return a random background image from Nextcloud."""
-    result = get_random_image()
+    result = get_random_image(current_profile().nextcloud_folder)
     if result:
-        image_bytes, content_type = result
-        response = Response(image_bytes, mimetype=content_type)
+        image_file, content_type, size = result
+        response = Response(wrap_file(request.environ, image_file), mimetype=content_type, direct_passthrough=True)
+        response.content_length = size
         response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
         response.headers['Pragma'] = 'no-cache'
         response.headers['Expires'] = '0'
         return response
     return Response("No images found", status=404)
 
+@app.route("/api/background/playlist")
+def api_background_playlist():
+    """Return the photos of the current and next slideshow slots."""
+    count = max(1, min(request.args.get("count", default=3, type=int), MAX_PLAYLIST_COUNT))
+    playlist = get_playlist(current_profile().nextcloud_folder, count, time.time())
+    if playlist is None:
+        return jsonify({"error": "No images found", "items": []}), 404
+    response = jsonify(playlist)
+    items = playlist["items"]
+    if len(items) > 1:
+        # Let the browser fetch the next photo while the current one is shown
+        response.headers["Link"] = f"<{items[1]['url']}>; rel=preload; as=image"
+    return response
+
+@app.route("/api/background/<image_id>")
+def api_background_image(image_id):
+    """Return a slideshow photo. Ids change with the file, so it is cached for good."""
+    if image_id in request.if_none_match:
+        response = Response(status=304)
+        response.set_etag(image_id)
+        response.headers["Cache-Control"] = asset_proxy.IMMUTABLE_CACHE_CONTROL
+        return response
+    result = get_image(current_profile().nextcloud_folder, image_id)
+    if not result:
+        return Response("Not found", status=404)
+    image_file, content_type, size = result
+    response = Response(wrap_file(request.environ, image_file), mimetype=content_type, direct_passthrough=True)
+    response.content_length = size
+    response.set_etag(image_id)
+    response.headers["Cache-Control"] = asset_proxy.IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+#METRICS -----------------------------------------------------------------------
+@app.route("/metrics")
+def api_metrics():
+    """Return request, upstream and cache metrics in Prometheus text format."""
+    return Response(metrics.render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
+#DEBUG -----------------------------------------------------------------------
+@app.route("/api/debug/memory")
+def api_debug_memory():
+    """Return cache sizes, evictions and spill statistics of the memory governor."""
+    response = jsonify(memory.get_memory_report())
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+@app.route("/api/debug/admission")
+def api_debug_admission():
+    """Return limits, queue depth and wait times of the admission pools."""
+    response = jsonify(admission.get_admission_report())
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+@app.route("/api/debug/startup")
+def api_debug_startup():
+    """Return import times and first-request latencies of this process."""
+    response = jsonify(startup.get_startup_report())
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=settings.flask_port, debug=settings.flask_debug)
@@ -0,0 +1,157 @@
+"""
+Priority-aware admission control for incoming requests.
+Every request belongs to a class (interactive JSON, heavy media,
+debug/admin) with its own pool of concurrent slots and its own bounded
+wait queue. Large image downloads can then only occupy the media slots, and
+the small widget requests never queue behind them. A request that finds its
+pool's queue full, or waits longer than the queue timeout, is answered with
+503 and Retry-After instead of holding a server thread.
+"""
+import math
+from threading import Condition
+from typing import Any, Dict, Optional
+from app.config.config import settings
+from app.modules import metrics
+
+INTERACTIVE = "interactive"
+MEDIA = "media"
+ADMIN = "admin"
+
+# First matching path prefix decides the class; everything else is interactive
+CLASS_BY_PREFIX = (
+    ("/api/background/playlist", INTERACTIVE),
+    ("/api/background", MEDIA),
+    ("/api/asset-proxy", MEDIA),
+    ("/api/debug/", ADMIN),
+    ("/metrics", ADMIN),
+)
+
+# Reasons a request is shed
+QUEUE_FULL = "queue_full"
+TIMEOUT = "timeout"
+
+
+class Pool:
+    """Concurrency limit with a bounded queue of waiting requests."""
+
+    def __init__(self, name: str, concurrency: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.concurrency = max(concurrency, 1)
+        self.max_queue = max(max_queue, 0)
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.max_wait_seconds = 0.0
+        self._condition = Condition()
+
+    def acquire(self) -> Optional[str]:
+        """
+        Take a slot, waiting up to queue_timeout for one to become free.
+
+        Returns:
+            None once a slot is taken, otherwise the rejection reason
+            (QUEUE_FULL or TIMEOUT)
+        """
+        start = metrics.now()
+        with self._condition:
+            if self.active >= self.concurrency:
+                if self.waiting >= self.max_queue:
+                    return self._reject(QUEUE_FULL)
+                self.waiting += 1
+                try:
+                    deadline = start + self.queue_timeout
+                    while self.active >= self.concurrency:
+                        remaining = deadline - metrics.now()
+                        if remaining <= 0:
+                            return self._reject(TIMEOUT)
+                        self._condition.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            self.active += 1
+            self.admitted += 1
+            waited = metrics.now() - start
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        metrics.admission_wait.observe(waited, self.name)
+        return None
+
+    def release(self) -> None:
+        """Free a slot and wake one waiting request."""
+        with self._condition:
+            self.active = max(self.active - 1, 0)
+            self._condition.notify()
+
+    def _reject(self, reason: str) -> str:
+        """Count a rejection; call with the condition held."""
+        self.rejected += 1
+        metrics.admission_rejected.inc(self.name, reason)
+        return reason
+
+    def retry_after(self) -> int:
+        """Seconds a rejected client should wait: about one queue timeout."""
+        return max(math.ceil(self.queue_timeout), 1)
+
+
+_pools: Dict[str, Pool] = {}
+
+
+def _create_pools() -> None:
+    timeout = settings.admission_queue_timeout_seconds
+    _pools[INTERACTIVE] = Pool(INTERACTIVE, settings.admission_interactive_concurrency,
+                               settings.admission_interactive_queue, timeout)
+    _pools[MEDIA] = Pool(MEDIA, settings.admission_media_concurrency,
+                         settings.admission_media_queue, timeout)
+    _pools[ADMIN] = Pool(ADMIN, settings.admission_admin_concurrency,
+                         settings.admission_admin_queue, timeout)
+
+
+def classify(path: str) -> str:
+    """
+    Get the request class of a path.
+
+    Args:
+        path: Request path, e.g. "/api/background/3f2a9c1b7d4e5f60"
+
+    Returns:
+        INTERACTIVE, MEDIA or ADMIN
+    """
+    for prefix, request_class in CLASS_BY_PREFIX:
+        if path.startswith(prefix):
+            return request_class
+    return INTERACTIVE
+
+
+def get_pool(request_class: str) -> Pool:
+    return _pools[request_class]
+
+
+def get_admission_report() -> Dict[str, Any]:
+    """
+    Get the limits, queue depth and wait statistics of every pool.
+
+    Returns:
+        Dictionary for the /api/debug/admission endpoint
+    """
+    report = {}
+    for name, pool in _pools.items():
+        with pool._condition:
+            report[name] = {
+                "concurrency": pool.concurrency,
+                "max_queue": pool.max_queue,
+                "queue_timeout_seconds": pool.queue_timeout,
+                "active": pool.active,
+                "waiting": pool.waiting,
+                "admitted": pool.admitted,
+                "rejected": pool.rejected,
+                "max_wait_seconds": round(pool.max_wait_seconds, 4),
+            }
+    return {"pools": report}
+
+
+_create_pools()
+
+metrics.register_gauge("frame_admission_queue_depth", "Requests waiting for a slot per pool", "pool",
+                       lambda: {name: pool.waiting for name, pool in _pools.items()})
+metrics.register_gauge("frame_admission_active", "Requests holding a slot per pool", "pool",
+                       lambda: {name: pool.active for name, pool in _pools.items()})
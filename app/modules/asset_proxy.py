@@ -0,0 +1,311 @@
+"""
+Local caching proxy for external widget assets (e.g. coin logos).
+Each asset is downloaded once, optionally resized to the size it is shown
+at, and stored on disk under its content hash. It is then served from
+/api/asset-proxy/<hash>.<ext> with immutable caching, so frames never have
+to reach the third-party CDN.
+
+Requested widths are snapped to a few fixed sizes, and the store is kept
+within ASSET_PROXY_MAX_MB and ASSET_PROXY_MAX_FILES by deleting the least
+recently served assets. Serving an asset refreshes its modification time.
+
+Resizing needs Pillow; without it assets are stored at their original size.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from io import BytesIO
+from threading import Lock
+from typing import Dict, Optional
+from urllib.parse import urlencode, urlsplit
+from flask import Request, Response, redirect, send_file
+from app.config.config import settings
+from app.modules import locks, upstream
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional, assets are then served unresized
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+URL_PREFIX = "/api/asset-proxy"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+MAX_ASSET_BYTES = 2 * 1024 * 1024
+# Widths assets are stored at; requests are rounded up to the next one
+WIDTHS = (16, 32, 64, 128, 256, 512, 1024)
+INDEX_FILE = "index.json"
+
+# Magic bytes of the formats we store: (prefix, extension, mimetype)
+_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", ".png", "image/png"),
+    (b"\xff\xd8\xff", ".jpg", "image/jpeg"),
+    (b"GIF8", ".gif", "image/gif"),
+    (b"RIFF", ".webp", "image/webp"),
+]
+_MIMETYPES = {ext: mimetype for _, ext, mimetype in _SIGNATURES}
+_MIMETYPES[".svg"] = "image/svg+xml"
+
+# Stored assets: {"<width>|<url>": "<hash>.<ext>"}, persisted as index.json
+_index: Dict[str, str] = {}
+_index_loaded = False
+_index_lock = Lock()
+# One lock per asset so concurrent first requests share a single download
+_fetch_locks = locks.KeyedLocks()
+
+
+def _get_allowed_hosts() -> set:
+    return {host.strip() for host in settings.asset_proxy_hosts.split(",") if host.strip()}
+
+
+def _index_key(url: str, width: Optional[int]) -> str:
+    return f"{width or 0}|{url}"
+
+
+def _index_path() -> str:
+    return os.path.join(settings.asset_proxy_dir, INDEX_FILE)
+
+
+def _load_index() -> None:
+    """Read the index of stored assets once; call with _index_lock held."""
+    global _index_loaded
+    if _index_loaded:
+        return
+    _index_loaded = True
+    try:
+        with open(_index_path(), encoding="utf-8") as f:
+            stored = json.load(f)
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable asset index %s: %s", _index_path(), e)
+        return
+    # Entries whose file is gone are fetched again
+    _index.update({
+        key: name for key, name in stored.items()
+        if os.path.exists(os.path.join(settings.asset_proxy_dir, name))
+    })
+
+
+def _write_atomically(path: str, content: bytes) -> None:
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".asset-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _sniff(content: bytes) -> Optional[str]:
+    """Get the file extension of an image from its first bytes."""
+    for signature, ext, _ in _SIGNATURES:
+        if content.startswith(signature):
+            return ext
+    if b"<svg" in content[:1024]:
+        return ".svg"
+    return None
+
+
+def _resize(content: bytes, ext: str, width: Optional[int]) -> bytes:
+    """Scale a raster image down to the given width, keeping its aspect ratio and format."""
+    if Image is None or not width or ext == ".svg":
+        return content
+    with Image.open(BytesIO(content)) as image:
+        if image.width <= width:
+            return content
+        height = max(round(image.height * width / image.width), 1)
+        resized = image.resize((width, height), Image.LANCZOS)
+        out = BytesIO()
+        resized.save(out, format=image.format)
+        return out.getvalue()
+
+
+def snap_width(width: Optional[int]) -> Optional[int]:
+    """Round a requested width up to the next of WIDTHS (None keeps the original size)."""
+    if not width or width <= 0:
+        return None
+    return next((size for size in WIDTHS if size >= width), WIDTHS[-1])
+
+
+def _enforce_disk_budget() -> None:
+    """
+    Delete the least recently served assets until the store is within
+    ASSET_PROXY_MAX_MB and ASSET_PROXY_MAX_FILES; call with _index_lock held.
+    """
+    directory = settings.asset_proxy_dir
+    try:
+        entries = [
+            entry for entry in os.scandir(directory)
+            if entry.is_file() and entry.name != INDEX_FILE and not entry.name.startswith(".")
+        ]
+    except OSError:
+        return
+    files = sorted((entry.stat().st_mtime, entry.stat().st_size, entry.name) for entry in entries)
+    total_bytes = sum(size for _, size, _ in files)
+    count = len(files)
+    max_bytes = settings.asset_proxy_max_mb * 1024 * 1024
+    # Oldest first; the asset that was just stored is the newest and goes last
+    for _, size, name in files:
+        if total_bytes <= max_bytes and count <= settings.asset_proxy_max_files:
+            break
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError as e:
+            logger.warning("Could not evict stored asset %s: %s", name, e)
+            continue
+        total_bytes -= size
+        count -= 1
+        for key in [key for key, stored in _index.items() if stored == name]:
+            del _index[key]
+
+
+def is_allowed(url: str) -> bool:
+    """Check that a URL points to one of the hosts the proxy may fetch from."""
+    parts = urlsplit(url)
+    return parts.scheme in ("http", "https") and parts.hostname in _get_allowed_hosts()
+
+
+def get_stored_name(url: str, width: Optional[int] = None) -> Optional[str]:
+    """Get the file name of an already stored asset, None if it wasn't fetched yet."""
+    with _index_lock:
+        _load_index()
+        return _index.get(_index_key(url, width))
+
+
+def proxy_url(url: str, width: Optional[int] = None) -> str:
+    """
+    Get the local URL to use instead of an external asset URL.
+
+    Args:
+        url: External URL, e.g. a CoinGecko logo
+        width: Width the asset is shown at (in device pixels), None for the original
+
+    Returns:
+        The immutable /api/asset-proxy/<hash>.<ext> URL if the asset is
+        stored already, otherwise an /api/asset-proxy?url=... URL that
+        fetches it and redirects there. URLs of other hosts are returned unchanged.
+    """
+    if not is_allowed(url):
+        return url
+    width = snap_width(width)
+    name = get_stored_name(url, width)
+    if name is not None:
+        return f"{URL_PREFIX}/{name}"
+    params = {"url": url}
+    if width:
+        params["w"] = width
+    return f"{URL_PREFIX}?{urlencode(params)}"
+
+
+def fetch_asset(url: str, width: Optional[int] = None) -> str:
+    """
+    Download an external asset once and store it under its content hash.
+
+    Args:
+        url: External URL (must be on an allowed host)
+        width: Optional width to scale raster images down to
+
+    Returns:
+        File name of the stored asset, e.g. "3f2a9c1b7d4e5f60.png"
+
+    Raises:
+        ValueError: If the host isn't allowed or the content isn't a supported image
+    """
+    if not is_allowed(url):
+        raise ValueError(f"Host not allowed: {urlsplit(url).hostname}")
+    width = snap_width(width)
+    key = _index_key(url, width)
+
+    with _fetch_locks.hold(key):
+        name = get_stored_name(url, width)
+        if name is not None:
+            return name
+
+        with upstream.download("asset-proxy", url, timeout=10) as body:
+            content = body.read(MAX_ASSET_BYTES + 1)
+        if len(content) > MAX_ASSET_BYTES:
+            raise ValueError(f"Asset larger than {MAX_ASSET_BYTES} bytes: {url}")
+        ext = _sniff(content)
+        if ext is None:
+            raise ValueError(f"Not a supported image: {url}")
+
+        content = _resize(content, ext, width)
+        name = hashlib.sha256(content).hexdigest()[:16] + ext
+        path = os.path.join(settings.asset_proxy_dir, name)
+        if not os.path.exists(path):
+            _write_atomically(path, content)
+
+        with _index_lock:
+            _index[key] = name
+            _enforce_disk_budget()
+            index = dict(_index)
+        _write_atomically(_index_path(), json.dumps(index, indent=1).encode("utf-8"))
+        return name
+
+
+def resolve(request: Request) -> Response:
+    """
+    Handle /api/asset-proxy?url=...&w=...: fetch the asset if needed and
+    redirect to its immutable URL.
+
+    Args:
+        request: The current request
+
+    Returns:
+        A redirect, or an error response
+    """
+    url = request.args.get("url", "")
+    if not is_allowed(url):
+        return Response("Host not allowed", status=403, mimetype="text/plain")
+    try:
+        name = fetch_asset(url, request.args.get("w", type=int))
+    except ValueError as e:
+        return Response(str(e), status=422, mimetype="text/plain")
+    except Exception as e:
+        logger.warning("Asset proxy could not fetch %s: %s", url, e)
+        # Let the browser try the original while the upstream is unavailable
+        response = redirect(url, code=302)
+        response.headers["Cache-Control"] = "no-store"
+        return response
+
+    response = redirect(f"{URL_PREFIX}/{name}", code=302)
+    response.headers["Cache-Control"] = "public, max-age=3600"
+    return response
+
+
+def serve(name: str) -> Response:
+    """
+    Serve a stored asset by its content-hash file name with immutable caching.
+
+    Args:
+        name: File name from the URL
+
+    Returns:
+        The file, or a 404 for unknown names
+    """
+    stem, ext = os.path.splitext(name)
+    if ext not in _MIMETYPES or not stem.isalnum():
+        return Response("Not found", status=404)
+    path = os.path.join(settings.asset_proxy_dir, name)
+    if not os.path.exists(path):
+        return Response("Not found", status=404)
+    try:
+        # The modification time orders assets for eviction
+        os.utime(path)
+    except OSError:
+        pass
+
+    response = send_file(
+        os.path.abspath(path), mimetype=_MIMETYPES[ext], etag=stem, conditional=True,
+    )
+    response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    # Stored SVGs come from third parties; never let them run scripts on this origin
+    response.headers["Content-Security-Policy"] = "default-src 'none'; style-src 'unsafe-inline'"
+    return response
@@ -0,0 +1,364 @@
+"""
+Static asset pipeline.
+At startup the JS modules are bundled and minified, and the stylesheet and
+the vendored Chart.js are fingerprinted by content hash. The results are kept
+in memory (plain and pre-compressed) and served under
+/static/dist/<name>.<hash>.<ext> with Cache-Control: immutable. Templates get
+the current names through `asset_url`.
+
+Run `python -m app.modules.assets vendor` once to download Chart.js into
+app/static/vendor; until then the page falls back to the CDN.
+"""
+import hashlib
+import logging
+import os
+import re
+import sys
+from threading import Lock
+from typing import Dict, List, Optional
+from flask import Request, Response
+from app.modules import memory, response_layer, startup
+
+logger = logging.getLogger(__name__)
+
+URL_PREFIX = "/static/dist/"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Bundles in load order; paths are relative to the static folder
+BUNDLES: Dict[str, List[str]] = {
+    "app.js": [
+        "js/main.js",
+        "js/background.js",
+        "js/clock.js",
+        "js/weather.js",
+        "js/calendar.js",
+        "js/crypto.js",
+        "js/crypto-chart.js",
+        "js/countdown.js",
+        "js/daily_word.js",
+    ],
+}
+# Single files that are only fingerprinted (and minified if CSS)
+FILES: Dict[str, str] = {
+    "style.css": "css/style.css",
+    "chart.js": "vendor/chart.umd.js",
+}
+
+CHART_JS_VERSION = "4.4.1"
+CHART_JS_CDN_URL = f"https://cdn.jsdelivr.net/npm/chart.js@{CHART_JS_VERSION}/dist/chart.umd.js"
+# Vendored files have their SHA-256 committed next to them
+PIN_SUFFIX = ".sha256"
+# Used by asset_url while an asset is not available locally
+FALLBACK_URLS = {"chart.js": CHART_JS_CDN_URL}
+
+MIMETYPES = {".js": "text/javascript", ".css": "text/css"}
+
+
+class Asset:
+    """A built asset held in memory."""
+
+    def __init__(self, name: str, content: bytes):
+        self.name = name
+        self.content = content
+        self.digest = hashlib.sha256(content).hexdigest()[:12]
+        stem, ext = os.path.splitext(name)
+        self.hashed_name = f"{stem}.{self.digest}{ext}"
+        self.mimetype = MIMETYPES.get(ext, "application/octet-stream")
+        # Pre-compressed variants: {encoding: bytes}
+        self.encoded = {
+            encoding: response_layer.compress(content, encoding)
+            for encoding in response_layer.get_available_encodings()
+        }
+
+
+_assets: Dict[str, Asset] = {}
+_assets_by_hashed_name: Dict[str, Asset] = {}
+_source_mtimes: Dict[str, float] = {}
+_static_folder: Optional[str] = None
+_assets_lock = Lock()
+
+
+#MINIFICATION -----------------------------------------------------------------------
+# A "/" after one of these (or at the start) begins a regex literal, not a division
+_REGEX_PRECEDERS = set("(,=:[!&|?{};+-*%<>~^")
+
+
+def minify_js(source: str) -> str:
+    """
+    Conservatively minify JavaScript: drop comments, indentation and blank
+    lines. Line breaks are kept so automatic semicolon insertion still works.
+    Strings, template literals and regex literals are copied unchanged.
+
+    Args:
+        source: JavaScript source
+
+    Returns:
+        Minified source
+    """
+    out = []
+    i = 0
+    length = len(source)
+    last_significant = ""
+    while i < length:
+        char = source[i]
+        next_char = source[i + 1] if i + 1 < length else ""
+
+        if char in "'\"`":
+            end = i + 1
+            while end < length and source[end] != char:
+                end += 2 if source[end] == "\\" else 1
+            out.append(source[i:end + 1])
+            last_significant = char
+            i = end + 1
+        elif char == "/" and next_char == "/":
+            while i < length and source[i] != "\n":
+                i += 1
+        elif char == "/" and next_char == "*":
+            end = source.find("*/", i + 2)
+            i = length if end == -1 else end + 2
+            out.append(" ")
+        elif char == "/" and (last_significant == "" or last_significant in _REGEX_PRECEDERS):
+            end = i + 1
+            in_class = False
+            while end < length and source[end] != "\n":
+                if source[end] == "\\":
+                    end += 2
+                    continue
+                if source[end] == "[":
+                    in_class = True
+                elif source[end] == "]":
+                    in_class = False
+                elif source[end] == "/" and not in_class:
+                    break
+                end += 1
+            out.append(source[i:end + 1])
+            last_significant = "/"
+            i = end + 1
+        else:
+            out.append(char)
+            if not char.isspace():
+                last_significant = char
+            i += 1
+
+    lines = (line.strip() for line in "".join(out).splitlines())
+    return "\n".join(line for line in lines if line) + "\n"
+
+
+def minify_css(source: str) -> str:
+    """Drop comments, indentation and blank lines from CSS."""
+    source = re.sub(r"/\*.*?\*/", "", source, flags=re.DOTALL)
+    lines = (line.strip() for line in source.splitlines())
+    return "\n".join(line for line in lines if line) + "\n"
+
+
+#BUILD -----------------------------------------------------------------------
+def _read(static_folder: str, path: str) -> str:
+    with open(os.path.join(static_folder, path), encoding="utf-8") as f:
+        return f.read()
+
+
+def _build_bundle(static_folder: str, paths: List[str]) -> bytes:
+    parts = [f"/* {path} */\n" + minify_js(_read(static_folder, path)) for path in paths]
+    return "".join(parts).encode("utf-8")
+
+
+def _build_file(static_folder: str, path: str) -> bytes:
+    if path.endswith(".css"):
+        return minify_css(_read(static_folder, path)).encode("utf-8")
+    # Vendored files are already minified
+    with open(os.path.join(static_folder, path), "rb") as f:
+        content = f.read()
+    _check_pin(static_folder, path, content)
+    return content
+
+
+def _check_pin(static_folder: str, path: str, content: bytes) -> None:
+    """Compare a vendored file with the SHA-256 committed next to it (<file>.sha256)."""
+    try:
+        with open(os.path.join(static_folder, path + PIN_SUFFIX), encoding="utf-8") as f:
+            pinned = f.read().split()[0]
+    except (OSError, IndexError):
+        logger.warning("No pinned hash for %s; run `python -m app.modules.assets vendor`", path)
+        return
+    actual = hashlib.sha256(content).hexdigest()
+    if actual != pinned:
+        logger.error("%s does not match its pinned SHA-256 (%s, expected %s)", path, actual, pinned)
+
+
+def _get_source_mtimes(static_folder: str) -> Dict[str, float]:
+    mtimes = {}
+    for path in [p for paths in BUNDLES.values() for p in paths] + list(FILES.values()):
+        try:
+            mtimes[path] = os.path.getmtime(os.path.join(static_folder, path))
+        except OSError:
+            mtimes[path] = 0.0
+    return mtimes
+
+
+def build_assets(static_folder: str) -> Dict[str, str]:
+    """
+    Bundle, minify and fingerprint all assets.
+
+    Args:
+        static_folder: The Flask app's static folder
+
+    Returns:
+        Dictionary of {name: hashed_name} of the assets that were built
+    """
+    global _static_folder
+    assets = {}
+    for name, paths in BUNDLES.items():
+        assets[name] = Asset(name, _build_bundle(static_folder, paths))
+    for name, path in FILES.items():
+        try:
+            assets[name] = Asset(name, _build_file(static_folder, path))
+        except FileNotFoundError:
+            logger.warning("Asset %s not found at %s, using %s", name, path, FALLBACK_URLS.get(name))
+
+    with _assets_lock:
+        _assets.clear()
+        _assets.update(assets)
+        _assets_by_hashed_name.clear()
+        _assets_by_hashed_name.update({asset.hashed_name: asset for asset in assets.values()})
+        _source_mtimes.clear()
+        _source_mtimes.update(_get_source_mtimes(static_folder))
+        _static_folder = static_folder
+    return {name: asset.hashed_name for name, asset in assets.items()}
+
+
+def rebuild_if_changed() -> None:
+    """Rebuild the assets if a source file changed since the last build (for debug mode)."""
+    if _static_folder is not None and _get_source_mtimes(_static_folder) != _source_mtimes:
+        build_assets(_static_folder)
+
+
+#LOOKUP -----------------------------------------------------------------------
+def asset_url(name: str) -> str:
+    """
+    Get the fingerprinted URL of an asset, for use in templates.
+
+    Args:
+        name: Logical asset name, e.g. "app.js"
+
+    Returns:
+        URL like /static/dist/app.3f2a9c1b7d4e.js, or the fallback URL if the
+        asset isn't available locally
+    """
+    with _assets_lock:
+        asset = _assets.get(name)
+    if asset is not None:
+        return URL_PREFIX + asset.hashed_name
+    if name in FALLBACK_URLS:
+        return FALLBACK_URLS[name]
+    raise KeyError(f"Unknown asset: {name}")
+
+
+def get_asset(hashed_name: str) -> Optional[Asset]:
+    """Get a built asset by its fingerprinted file name."""
+    with _assets_lock:
+        return _assets_by_hashed_name.get(hashed_name)
+
+
+def get_asset_stats() -> Dict[str, int]:
+    """Report the size of the built assets for the memory governor."""
+    with _assets_lock:
+        assets = list(_assets.values())
+    return {
+        "entries": len(assets),
+        "bytes": sum(len(asset.content) + sum(len(body) for body in asset.encoded.values()) for asset in assets),
+    }
+
+
+def evict_encoded_assets(bytes_to_free: int) -> int:
+    """
+    Drop the pre-compressed variants of the assets, largest first. Their
+    plain content is kept, as it is served under immutable URLs.
+
+    Args:
+        bytes_to_free: Number of bytes the memory governor wants back
+
+    Returns:
+        Number of bytes freed
+    """
+    freed = 0
+    with _assets_lock:
+        for asset in sorted(_assets.values(), key=lambda asset: -len(asset.content)):
+            if freed >= bytes_to_free:
+                break
+            freed += sum(len(body) for body in asset.encoded.values())
+            asset.encoded = {}
+    return freed
+
+
+def serve_asset(request: Request, hashed_name: str) -> Response:
+    """
+    Build the response for a fingerprinted asset, pre-compressed if the client
+    accepts it. The name changes with the content, so it can be cached forever.
+
+    Args:
+        request: The current request
+        hashed_name: Fingerprinted file name from the URL
+
+    Returns:
+        The asset response, or a 404 for unknown (e.g. outdated) names
+    """
+    asset = get_asset(hashed_name)
+    if asset is None:
+        return Response("Not found", status=404)
+
+    encoding = response_layer.choose_encoding(request)
+    if encoding not in asset.encoded:
+        # Compressed variants may have been evicted by the memory governor
+        encoding = None
+    response = Response(asset.encoded[encoding] if encoding else asset.content, mimetype=asset.mimetype)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    response.vary.add("Accept-Encoding")
+    response.set_etag(asset.digest)
+    return response.make_conditional(request)
+
+
+memory.register_cache("assets", memory.PRIORITY_FALLBACK, get_asset_stats, evict_encoded_assets)
+
+
+#VENDORING -----------------------------------------------------------------------
+def vendor_chart_js(static_folder: str) -> str:
+    """
+    Download the pinned Chart.js build into the static folder and write its
+    SHA-256 next to it. Commit both files.
+
+    Args:
+        static_folder: The Flask app's static folder
+
+    Returns:
+        Path of the written file
+    """
+    requests = startup.lazy_import("requests")
+    resp = requests.get(CHART_JS_CDN_URL, timeout=30)
+    resp.raise_for_status()
+    path = os.path.join(static_folder, FILES["chart.js"])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(resp.content)
+    # Committed with the file, so later edits or re-downloads are noticed
+    with open(path + PIN_SUFFIX, "w", encoding="utf-8") as f:
+        f.write(f"{hashlib.sha256(resp.content).hexdigest()}  chart.umd.js {CHART_JS_VERSION}\n")
+    return path
+
+
+def main():
+    """Build the assets and print their names, or vendor Chart.js with `vendor`."""
+    static_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+    if sys.argv[1:] == ["vendor"]:
+        path = vendor_chart_js(static_folder)
+        print(f"Chart.js {CHART_JS_VERSION} written to {path}")
+        return
+    for name, hashed_name in build_assets(static_folder).items():
+        asset = get_asset(hashed_name)
+        sizes = ", ".join(f"{encoding} {len(body):,}" for encoding, body in asset.encoded.items())
+        print(f"{name:<10} -> {hashed_name:<28} {len(asset.content):>9,} bytes ({sizes})")
+
+
+if __name__ == "__main__":
+    main()
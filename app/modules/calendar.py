@@ -1,64 +1,292 @@
-from ics import Calendar
-import requests
+import hashlib
+import json
+import time
+from app.modules import ics_scanner, memory, snapshot, timing, upstream
 from datetime import datetime, timezone
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
 from app.config.config import settings
-from flask import jsonify
+from flask import Response, jsonify
 
+# Feed states kept for computing deltas; clients on older versions get the full list
+MAX_VERSIONS_PER_FEED = 8
 
-def _get_calendar_events(calendar_url: str, max_events: int = 5):
+# Recent states per feed, oldest first: [(version, digest, {event_id: event}, estimated bytes)]
+_feed_versions: Dict[str, List[Tuple[int, str, Dict[str, dict], int]]] = {}
+_last_version = 0
+_versions_lock = Lock()
+
+
+def _event_id(item: dict) -> Optional[str]:
+    """Stable id of a scanned event: its UID, plus the recurrence id for single occurrences."""
+    if not item["uid"]:
+        return None
+    return f"{item['uid']}/{item['recurrence_id']}" if item["recurrence_id"] else item["uid"]
+
+
+def _fetch_calendar_events(calendar_url: str, tz_name: str, max_events: int = 5) -> list:
+    # Floating and all-day times are in the frame's timezone
+    default_tz = ics_scanner.get_timezone(tz_name) or timezone.utc
+    start_of_today = datetime.now(default_tz).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    with upstream.download("calendar", calendar_url, timeout=5) as feed:
+        with timing.phase("parse"):
+            upcoming = ics_scanner.upcoming_events(feed, start_of_today, max_events, default_tz)
+
+    return [
+        {
+            "id": _event_id(item),
+            "name": item["name"],
+            "begin": item["begin"].isoformat(),
+            "end": item["end"].isoformat() if item["end"] else None,
+        }
+        for item in upcoming
+    ]
+
+
+#DELTA SYNC -----------------------------------------------------------------------
+def _with_ids(events: list) -> list:
+    """Give every event an id; events without a UID (or from old snapshots) get a content hash."""
+    result = []
+    for event in events:
+        if not event.get("id"):
+            key = f"{event.get('name')}|{event.get('begin')}"
+            event = {**event, "id": hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]}
+        result.append(event)
+    return result
+
+
+def _next_version() -> int:
+    # Milliseconds since the epoch, so versions from before a restart are never reissued
+    global _last_version
+    _last_version = max(_last_version + 1, int(time.time() * 1000))
+    return _last_version
+
+
+def _record_feed_state(feed_key: str, events: list) -> int:
+    """
+    Record the current events of a feed, issuing a new version if they changed.
+
+    Args:
+        feed_key: Snapshot name of the feed (its URL and timezone)
+        events: Events with ids
+
+    Returns:
+        Version of the feed's current state
+    """
+    by_id = {event["id"]: event for event in events}
+    digest = hashlib.sha1(json.dumps(by_id, sort_keys=True).encode("utf-8")).hexdigest()
+    with _versions_lock:
+        history = _feed_versions.setdefault(feed_key, [])
+        if history and history[-1][1] == digest:
+            return history[-1][0]
+        version = _next_version()
+        history.append((version, digest, by_id, memory.estimate_size(by_id)))
+        del history[:-MAX_VERSIONS_PER_FEED]
+    memory.enforce_budget()
+    return version
+
+
+def _get_feed_state(feed_key: str, version: int) -> Optional[Dict[str, dict]]:
+    """Get a feed's events at exactly that version, None if that state is no longer kept."""
+    with _versions_lock:
+        for entry_version, _, by_id, _ in _feed_versions.get(feed_key, []):
+            if entry_version == version:
+                return by_id
+    return None
+
+
+def parse_since(value: Optional[str]) -> Optional[Dict[str, int]]:
+    """
+    Parse the versions a client already has, e.g. "personal:123,holidays:456".
+
+    Args:
+        value: The `since` query parameter
+
+    Returns:
+        Dictionary of {calendar_type: version}, or None without a parameter.
+        Malformed entries are left out, so those calendars are sent in full.
+    """
+    if value is None:
+        return None
+    versions = {}
+    for item in value.split(","):
+        name, _, version = item.rpartition(":")
+        if name and version.isdigit():
+            versions[name] = int(version)
+    return versions
+
+
+def get_feed_version_stats() -> Dict[str, int]:
+    """Report the size of the kept feed states for the memory governor."""
+    with _versions_lock:
+        entries = [entry for history in _feed_versions.values() for entry in history]
+    return {"entries": len(entries), "bytes": sum(entry[3] for entry in entries)}
+
+
+def evict_feed_versions(bytes_to_free: int) -> int:
+    """
+    Drop kept feed states, oldest versions first. Clients on a dropped
+    version get the full lists on their next request.
+
+    Args:
+        bytes_to_free: Number of bytes the memory governor wants back
+
+    Returns:
+        Number of bytes freed
+    """
+    freed = 0
+    with _versions_lock:
+        entries = sorted(
+            (entry[0], feed_key, entry[3])
+            for feed_key, history in _feed_versions.items() for entry in history
+        )
+        for version, feed_key, size in entries:
+            if freed >= bytes_to_free:
+                break
+            history = _feed_versions[feed_key]
+            history[:] = [entry for entry in history if entry[0] != version]
+            if not history:
+                del _feed_versions[feed_key]
+            freed += size
+    return freed
+
+
+def diff_events(old: Dict[str, dict], new: Dict[str, dict]) -> dict:
+    """
+    Compare two states of a feed.
+
+    Args:
+        old: Events the client has, by id
+        new: Current events, by id
+
+    Returns:
+        Dictionary with the "added" and "changed" events and the "removed" ids
+    """
+    return {
+        "added": [event for event_id, event in new.items() if event_id not in old],
+        "changed": [event for event_id, event in new.items() if event_id in old and old[event_id] != event],
+        "removed": [event_id for event_id in old if event_id not in new],
+    }
+
+
+def _calendar_snapshot_name(calendar_url: str, tz_name: str) -> str:
+    # "Today" and all-day events depend on the timezone, so it is part of the key
+    return f"calendar:{tz_name}:{calendar_url}"
+
+
+def peek_calendar_events(calendars: dict, tz_name: str) -> Optional[Tuple[dict, bool]]:
+    """
+    Return the stored events of all calendars without fetching.
+
+    Args:
+        calendars: Dictionary of {calendar_type: ics_url}
+        tz_name: IANA timezone of the frame
+
+    Returns:
+        Tuple of (payload, is_fresh) shaped like the /api/calendar response,
+        or None if no calendar has a snapshot yet. "complete" is False if a
+        calendar was left out for lack of a snapshot.
+    """
+    results = {}
+    complete = True
+    all_fresh = True
+    for name, url in calendars.items():
+        if len(url) <= 5:
+            continue
+        feed_key = _calendar_snapshot_name(url, tz_name)
+        peeked = snapshot.peek_snapshot(feed_key, settings.calendar_cache_seconds)
+        if peeked is None:
+            complete = False
+            all_fresh = False
+            continue
+        events, fresh = peeked
+        events = _with_ids(events)
+        version = _record_feed_state(feed_key, events)
+        results[name] = {"events": events, "version": version}
+        all_fresh = all_fresh and fresh
+    if not results:
+        return None
+    return {"calendars": results, "complete": complete}, all_fresh
+
+
+def _get_calendar_events(calendar_url: str, tz_name: str, max_events: int = 5) -> dict:
     if not calendar_url or calendar_url == "empty":
-        return jsonify({
+        return {
             "error": "Calendar URL is not set",
             "events": [],
-        }), 200
-    
+        }
+
+    feed_key = _calendar_snapshot_name(calendar_url, tz_name)
     try:
-        resp = requests.get(calendar_url, timeout=5)
-        resp.raise_for_status()
-        
-        calendar = Calendar(resp.text)
-        now = datetime.now(timezone.utc)
-        start_of_today = now.replace(hour=0, minute=0, second=0, microsecond=0)
-
-        events = []
-        for event in sorted(calendar.events, key=lambda e: e.begin):
-            if len(events) >= max_events:
-                break
-                
-            event_begin = event.begin.datetime
-            if event_begin.tzinfo is None:
-                event_begin = event_begin.replace(tzinfo=timezone.utc)
-            
-            if event_begin >= start_of_today:
-                events.append({
-                    "name": event.name,
-                    "begin": event.begin.datetime.isoformat(),
-                    "end": event.end.datetime.isoformat() if event.end else None,
-                })
-
-        return jsonify({"events": events}), 200
+        events = snapshot.serve_with_snapshot(
+            feed_key,
+            lambda: _fetch_calendar_events(calendar_url, tz_name, max_events),
+            max_age=settings.calendar_cache_seconds,
+        )
+        events = _with_ids(events)
+        return {"events": events, "version": _record_feed_state(feed_key, events)}
 
     except Exception as e:
         print(f"Calendar error: {e}")
-        return jsonify({
-            "error": str(e),
+        return {
+            # Exception texts often contain object addresses; a fixed message keeps
+            # the body (and so the ETag and version) the same while a feed keeps failing
+            "error": f"Calendar unavailable ({type(e).__name__})",
             "events": [],
-        }), 500
+            # A feed that keeps failing stays at the same (empty) version
+            "version": _record_feed_state(feed_key, []),
+        }
 
-def return_calendar_events():
-    calendars = {
-        "personal": settings.calendar_ical_url,
-        "holidays": settings.calendar_holidays_url,
-        "garbage": settings.calendar_garbage_url,
-    }
+def return_calendar_events(calendars: dict, tz_name: str, since: Optional[Dict[str, int]] = None):
+    """
+    Return upcoming events for each calendar.
+    Feeds are cached by URL and timezone, so frames sharing a calendar share one download.
+
+    Every event has a stable "id" and every calendar a "version". A client
+    passing those versions back as `since` only gets the calendars that
+    changed, each diffed against its own version:
+    {"added": [...], "changed": [...], "removed": [ids]}. Calendars the client
+    has no version for, or whose version is no longer known, come with the
+    full "events" list. If nothing changed the answer is an empty 204.
 
+    Args:
+        calendars: Dictionary of {calendar_type: ics_url}
+        tz_name: IANA timezone of the frame, decides "today" and all-day events
+        since: Dictionary of {calendar_type: version} the client already has
+    """
     results = {}
-    for name, url in calendars.items():
-        if len(url) > 5:
-            response, status = _get_calendar_events(url)
-            data = response.get_json()
-            results[name] = data
-
-    return jsonify({
-        "calendars": results
-    }), 200
+    feeds = [(name, url) for name, url in calendars.items() if len(url) > 5]
+    for index, (name, url) in enumerate(feeds):
+        # A slow feed may only use its share of the request's deadline
+        with upstream.deadline_slice(len(feeds) - index):
+            results[name] = _get_calendar_events(url, tz_name)
+
+    if since is None:
+        return jsonify({"calendars": results}), 200
+
+    changes = {}
+    for name, url in feeds:
+        result = results[name]
+        known = since.get(name)
+        if known == result["version"]:
+            continue
+        old = None
+        if known is not None:
+            old = _get_feed_state(_calendar_snapshot_name(url, tz_name), known)
+        if old is None:
+            changes[name] = result
+        else:
+            new = {event["id"]: event for event in result["events"]}
+            changes[name] = {**diff_events(old, new), "version": result["version"]}
+
+    if not changes:
+        response = Response(status=204)
+    else:
+        response = jsonify({"calendars": changes, "since": since})
+    # Deltas only apply to the version they were computed against
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+memory.register_cache("calendar-versions", memory.PRIORITY_REFETCHABLE, get_feed_version_stats, evict_feed_versions)
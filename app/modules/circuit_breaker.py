@@ -0,0 +1,142 @@
+"""
+Circuit breakers for upstream hosts.
+A breaker opens when too many of the recent calls to its host failed, so
+requests fail fast into cached or static fallbacks instead of waiting out
+the timeout. After a cooldown a single probe call is let through
+(half-open); its outcome closes the breaker again or re-opens it.
+"""
+import time
+from collections import deque
+from threading import Lock
+from typing import Dict
+from app.config.config import settings
+from app.modules import metrics
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Numeric states for the metrics gauge
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a host whose breaker is open."""
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker over a sliding window of recent calls."""
+
+    def __init__(self, name: str, window_size: int, failure_rate: float,
+                 min_calls: int, open_seconds: float):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        # True for every failed call, False for every successful one
+        self._outcomes = deque(maxlen=window_size)
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = Lock()
+
+    def allow(self) -> bool:
+        """
+        Check whether a call may be made now.
+        An open breaker turns half-open after its cooldown and then admits
+        exactly one probe call until that call's outcome is recorded.
+
+        Returns:
+            True if the call may go ahead
+        """
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    return False
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == HALF_OPEN:
+                if self._probe_in_flight:
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        """Record a successful call; a successful probe closes the breaker."""
+        with self._lock:
+            if self.state == OPEN:
+                # A call that started before the breaker opened; only the probe decides
+                return
+            if self.state == HALF_OPEN:
+                self._close()
+                return
+            self._outcomes.append(False)
+
+    def record_failure(self) -> None:
+        """Record a failed call and open the breaker if the failure rate is too high."""
+        with self._lock:
+            if self.state == OPEN:
+                # Late outcomes must not re-open the breaker and extend its cooldown
+                return
+            if self.state == HALF_OPEN:
+                self._open()
+                return
+            self._outcomes.append(True)
+            if len(self._outcomes) >= self.min_calls:
+                failures = sum(self._outcomes)
+                if failures / len(self._outcomes) >= self.failure_rate:
+                    self._open()
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+    def _close(self) -> None:
+        self.state = CLOSED
+        self._outcomes.clear()
+        self._probe_in_flight = False
+
+
+# Breakers by host (or upstream name for clients without a URL)
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """
+    Get the breaker of an upstream host, creating it on first use.
+
+    Args:
+        name: Host name, e.g. "api.openweathermap.org"
+
+    Returns:
+        The host's circuit breaker
+    """
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(
+                name,
+                window_size=settings.breaker_window_size,
+                failure_rate=settings.breaker_failure_rate,
+                min_calls=settings.breaker_min_calls,
+                open_seconds=settings.breaker_open_seconds,
+            )
+        return _breakers[name]
+
+
+def get_breaker_states() -> Dict[str, str]:
+    """
+    Get the current state of every breaker.
+
+    Returns:
+        Dictionary of {host: state}
+    """
+    with _breakers_lock:
+        return {name: breaker.state for name, breaker in _breakers.items()}
+
+
+metrics.register_gauge(
+    "frame_upstream_circuit_state", "Circuit breaker state per upstream host (0 closed, 1 half-open, 2 open)",
+    "host", lambda: {name: STATE_VALUES[state] for name, state in get_breaker_states().items()},
+)
@@ -1,18 +1,30 @@
-import requests
 from app.config.config import settings
-from flask import jsonify, request
-from app.modules.crypto_cache import get_cache_key, get_cached_or_fetch, get_cached_response
+from flask import Response, jsonify, request
+from app.modules import asset_proxy, sparkline, upstream
+from app.modules.crypto_cache import (
+    RateLimitCooldown, get_cache_key, get_cache_timestamp, get_cached_or_fetch, get_cached_response, is_cache_valid,
+)
+from typing import Optional, Tuple
+
+# Fetches that fail this way fall back to the cache or an error response
+FETCH_ERRORS = upstream.UPSTREAM_ERRORS + (RateLimitCooldown,)
+
+
+def _api_url(path: str) -> str:
+    """Build a CoinGecko API URL from the configured base URL."""
+    return f"{settings.coingecko_base_url.rstrip('/')}/api/v3{path}"
+
 
 def _fetch_coin_list():
     """Internal function to fetch coin list from API."""
-    resp = requests.get(
-        "https://api.coingecko.com/api/v3/coins/list",
+    resp = upstream.get(
+        "coingecko",
+        _api_url("/coins/list"),
         headers={
             "x-cg-demo-api-key": settings.crypto_api,
         },
         timeout=5,
     )
-    resp.raise_for_status()
     return resp.json()
 
 
@@ -31,11 +43,11 @@ def get_coin_id():
         }), 200
     
     try:
-        cache_key = get_cache_key("https://api.coingecko.com/api/v3/coins/list")
+        cache_key = get_cache_key(_api_url("/coins/list"))
         data = get_cached_or_fetch(cache_key, _fetch_coin_list)
         return jsonify({"data": data}), 200
     except Exception as e:
-        cache_key = get_cache_key("https://api.coingecko.com/api/v3/coins/list")
+        cache_key = get_cache_key(_api_url("/coins/list"))
         cached_data = get_cached_response(cache_key)
         if cached_data is not None:
             return jsonify({"data": cached_data}), 200
@@ -44,13 +56,11 @@ def get_coin_id():
             "data": [],
         }), 500
 
-def get_coin_config():
-    """
-    Get coin configuration from CoinGecko API.
-    
-    Returns:
-        JSON response with coin configuration
-    """
+# Coin logos are shown at up to 40 CSS pixels; twice that stays sharp on HiDPI screens
+COIN_ICON_SIZE = 80
+
+
+def _coin_config(coin_ids: str) -> dict:
     coin_config = {
         "bitcoin": {
             "name": "Bitcoin",
@@ -77,18 +87,41 @@ def get_coin_config():
         "litecoin": {"border": "rgba(136, 136, 136, 0.8)", "background": "rgba(191, 191, 191, 0.1)"},
     }
 
-    coin_ids_list = [coin_id.strip() for coin_id in settings.crypto_coin_ids.split(',') if coin_id.strip()]
+    # Logos are served from the local asset proxy instead of CoinGecko's CDN
+    for coin in coin_config.values():
+        coin["imageUrl"] = asset_proxy.proxy_url(coin["imageUrl"], COIN_ICON_SIZE)
+
+    coin_ids_list = [coin_id.strip() for coin_id in coin_ids.split(',') if coin_id.strip()]
     
-    return jsonify({
+    return {
         "coin_ids": coin_ids_list,
         "coin_config": coin_config,
         "coin_colors": coin_colors,
-    })
+    }
+
+
+def get_coin_config(coin_ids: str):
+    """
+    Get coin configuration from CoinGecko API.
+    
+    Args:
+        coin_ids: Comma-separated coin IDs of the frame
+    
+    Returns:
+        JSON response with coin configuration
+    """
+    return jsonify(_coin_config(coin_ids))
+
+
+def peek_coin_config(coin_ids: str) -> Tuple[dict, bool]:
+    """Return the coin configuration as (payload, is_fresh); it needs no upstream call."""
+    return _coin_config(coin_ids), True
 
 def _fetch_current_prices(coin_ids: str, vs_currencies: str):
     """Internal function to fetch current prices from API."""
-    resp = requests.get(
-        "https://api.coingecko.com/api/v3/simple/price",
+    resp = upstream.get(
+        "coingecko",
+        _api_url("/simple/price"),
         headers={
             "x-cg-demo-api-key": settings.crypto_api,
         },
@@ -98,14 +131,14 @@ def _fetch_current_prices(coin_ids: str, vs_currencies: str):
         },
         timeout=5,
     )
-    resp.raise_for_status()
     return resp.json()
 
 
 def _fetch_yesterday_price_data(coin_id: str, vs_currency: str):
     """Internal function to fetch historical data for yesterday's price calculation."""
-    hist_resp = requests.get(
-        f"https://api.coingecko.com/api/v3/coins/{coin_id}/market_chart",
+    hist_resp = upstream.get(
+        "coingecko",
+        _api_url(f"/coins/{coin_id}/market_chart"),
         headers={
             "x-cg-demo-api-key": settings.crypto_api,
         },
@@ -116,10 +149,74 @@ def _fetch_yesterday_price_data(coin_id: str, vs_currency: str):
         },
         timeout=5,
     )
-    hist_resp.raise_for_status()
     return hist_resp.json()
 
 
+def _canonical_coin_ids(coin_ids: str) -> str:
+    """Canonical order so frames with the same coins share one cache entry."""
+    return ",".join(sorted({coin_id.strip() for coin_id in coin_ids.split(",") if coin_id.strip()}))
+
+
+def _yesterday_cache_key(coin_id: str, vs_currency: str) -> str:
+    return get_cache_key(
+        _api_url(f"/coins/{coin_id}/market_chart"),
+        {"vs_currency": vs_currency, "days": 2, "interval": "daily"}
+    )
+
+
+def _history_cache_key(coin_id: str, vs_currency: str, days: int) -> str:
+    return get_cache_key(
+        _api_url(f"/coins/{coin_id}/market_chart"),
+        {"vs_currency": vs_currency, "days": days, "interval": "daily"}
+    )
+
+
+def peek_current_crypto_price(coin_ids: str, vs_currencies: str) -> Optional[Tuple[dict, bool]]:
+    """
+    Return cached prices shaped like the /api/crypto-price response, without fetching.
+
+    Returns:
+        Tuple of (payload, is_fresh), or None if no prices are cached
+    """
+    coin_ids = _canonical_coin_ids(coin_ids)
+    current_cache_key = get_cache_key(
+        _api_url("/simple/price"),
+        {"ids": coin_ids, "vs_currencies": vs_currencies}
+    )
+    current_data = get_cached_response(current_cache_key)
+    if not isinstance(current_data, dict):
+        return None
+
+    vs_currency = vs_currencies.split(',')[0]
+    result = {}
+    for coin_id, current_price_info in current_data.items():
+        result[coin_id] = current_price_info.copy()
+        hist_data = get_cached_response(_yesterday_cache_key(coin_id, vs_currency))
+        prices = hist_data.get("prices", []) if isinstance(hist_data, dict) else []
+        if prices:
+            result[coin_id]["usd_yesterday"] = prices[-2][1] if len(prices) >= 2 else prices[0][1]
+    return {"data": result}, is_cache_valid(current_cache_key)
+
+
+def peek_historical_crypto_price(coin_id: str, vs_currency: str, days: int) -> Optional[Tuple[dict, bool]]:
+    """
+    Return cached history shaped like the /api/crypto-history response, without fetching.
+
+    Returns:
+        Tuple of (payload, is_fresh), or None if no history is cached
+    """
+    cache_key = _history_cache_key(coin_id, vs_currency, days)
+    data = get_cached_response(cache_key)
+    if not isinstance(data, dict):
+        return None
+    return {
+        "coin": coin_id,
+        "vs_currency": vs_currency,
+        "days": days,
+        "prices": data.get("prices", []),
+    }, is_cache_valid(cache_key)
+
+
 def get_current_crypto_price(coin_ids: str, vs_currencies: str):
     """
     Get current cryptocurrency prices and yesterday's prices from CoinGecko API.
@@ -138,8 +235,9 @@ def get_current_crypto_price(coin_ids: str, vs_currencies: str):
             "data": [],
         }), 200
 
+    coin_ids = _canonical_coin_ids(coin_ids)
     current_cache_key = get_cache_key(
-        "https://api.coingecko.com/api/v3/simple/price",
+        _api_url("/simple/price"),
         {"ids": coin_ids, "vs_currencies": vs_currencies}
     )
     
@@ -160,10 +258,7 @@ def get_current_crypto_price(coin_ids: str, vs_currencies: str):
         
         for coin_id in coin_list:
             try:
-                hist_cache_key = get_cache_key(
-                    f"https://api.coingecko.com/api/v3/coins/{coin_id}/market_chart",
-                    {"vs_currency": vs_currency, "days": 2, "interval": "daily"}
-                )
+                hist_cache_key = _yesterday_cache_key(coin_id, vs_currency)
                 hist_data = get_cached_or_fetch(
                     hist_cache_key,
                     _fetch_yesterday_price_data,
@@ -179,10 +274,7 @@ def get_current_crypto_price(coin_ids: str, vs_currencies: str):
                     yesterday_price = prices[0][1]
                     yesterday_data[coin_id] = {"usd": yesterday_price}
             except Exception as e:
-                hist_cache_key = get_cache_key(
-                    f"https://api.coingecko.com/api/v3/coins/{coin_id}/market_chart",
-                    {"vs_currency": vs_currency, "days": 2, "interval": "daily"}
-                )
+                hist_cache_key = _yesterday_cache_key(coin_id, vs_currency)
                 cached_hist = get_cached_response(hist_cache_key)
                 if cached_hist is not None:
                     prices = cached_hist.get("prices", []) if isinstance(cached_hist, dict) else []
@@ -223,7 +315,7 @@ def get_current_crypto_price(coin_ids: str, vs_currencies: str):
 
 def _fetch_historical_prices(coin_id: str, vs_currency: str, days: int, api_key: str):
     """Internal function to fetch historical prices from API."""
-    url = f"https://api.coingecko.com/api/v3/coins/{coin_id}/market_chart"
+    url = _api_url(f"/coins/{coin_id}/market_chart")
     params = {
         "vs_currency": vs_currency,
         "days": days,
@@ -234,8 +326,7 @@ def _fetch_historical_prices(coin_id: str, vs_currency: str, days: int, api_key:
     if api_key and api_key != "empty":
         headers["x-cg-demo-api-key"] = api_key
     
-    resp = requests.get(url, params=params, headers=headers, timeout=10)
-    resp.raise_for_status()
+    resp = upstream.get("coingecko", url, params=params, headers=headers, timeout=10)
     return resp.json()
 
 
@@ -263,12 +354,7 @@ def get_historical_crypto_price(coin_id: str, vs_currency: str, days: int):
         }), 200
 
     try:
-        url = f"https://api.coingecko.com/api/v3/coins/{coin_id}/market_chart"
-        cache_key = get_cache_key(url, {
-            "vs_currency": vs_currency,
-            "days": days,
-            "interval": "daily"
-        })
+        cache_key = _history_cache_key(coin_id, vs_currency, days)
         
         data = get_cached_or_fetch(
             cache_key,
@@ -288,13 +374,8 @@ def get_historical_crypto_price(coin_id: str, vs_currency: str, days: int):
             "prices": prices
         }), 200
 
-    except requests.exceptions.RequestException as e:
-        url = f"https://api.coingecko.com/api/v3/coins/{coin_id}/market_chart"
-        cache_key = get_cache_key(url, {
-            "vs_currency": vs_currency,
-            "days": days,
-            "interval": "daily"
-        })
+    except FETCH_ERRORS as e:
+        cache_key = _history_cache_key(coin_id, vs_currency, days)
         cached_data = get_cached_response(cache_key)
         if cached_data is not None:
             prices = cached_data.get("prices", []) if isinstance(cached_data, dict) else []
@@ -309,3 +390,39 @@ def get_historical_crypto_price(coin_id: str, vs_currency: str, days: int):
             "error": f"Failed to fetch crypto prices: {str(e)}",
             "prices": []
         }), 500
+
+
+def get_crypto_sparkline(coin_id: str, vs_currency: str, days: int, width: int, height: int):
+    """
+    Get the price history of a coin as an SVG sparkline in the coin's colors.
+    Shares the history cache with /api/crypto-history; the SVG is rendered
+    again only when that cache entry is replaced.
+
+    Args:
+        coin_id: Coin ID (e.g., "bitcoin", "ethereum")
+        vs_currency: Target currency (e.g., "usd", "eur")
+        days: Number of days of historical data to draw
+        width: Image width in pixels
+        height: Image height in pixels
+
+    Returns:
+        Flask response with the SVG, or a 404 without price data
+    """
+    api_key = settings.crypto_api
+    if not api_key or api_key == "empty":
+        return Response("Crypto API is not set", status=404, mimetype="text/plain")
+
+    cache_key = _history_cache_key(coin_id, vs_currency, days)
+    try:
+        data = get_cached_or_fetch(cache_key, _fetch_historical_prices, coin_id, vs_currency, days, api_key)
+    except FETCH_ERRORS:
+        data = get_cached_response(cache_key)
+
+    prices = data.get("prices", []) if isinstance(data, dict) else []
+    version = get_cache_timestamp(cache_key)
+    if not prices or version is None:
+        return Response("No price data", status=404, mimetype="text/plain")
+
+    colors = _coin_config(coin_id)["coin_colors"].get(coin_id)
+    svg = sparkline.get_sparkline(cache_key, version, prices, width, height, colors, vs_currency)
+    return Response(svg, mimetype="image/svg+xml")
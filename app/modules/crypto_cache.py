@@ -1,17 +1,30 @@
 """
 Caching module for CoinGecko API responses.
 Implements a simple in-memory cache with 5-minute expiration to prevent rate limiting.
+The cache is registered with the memory governor, which evicts expired and
+old entries first when the memory budget is exceeded.
 """
+import threading
 import time
 from typing import Optional, Dict, Any
 from threading import Lock
+from app.modules import locks, memory, metrics
 
-# Cache storage: {cache_key: {"data": ..., "timestamp": ...}}
+# Cache storage: {cache_key: {"data": ..., "timestamp": ..., "size": estimated bytes}}
 _cache: Dict[str, Dict[str, Any]] = {}
 # Rate limit tracking: {cache_key: timestamp_of_last_429}
 _rate_limit_errors: Dict[str, float] = {}
+# Keys restored from a warm-start snapshot that have not been refreshed yet
+_warm_keys: set = set()
+# One lock per cache key so concurrent misses share a single upstream call
+_fetch_locks = locks.KeyedLocks()
 _cache_lock = Lock()
 
+
+class RateLimitCooldown(Exception):
+    """Raised instead of calling the API during a 429 cooldown when nothing is cached."""
+
+
 CACHE_EXPIRATION_SECONDS = 300
 # After a 429 error, wait 10 minutes before trying again
 RATE_LIMIT_COOLDOWN_SECONDS = 600
@@ -52,6 +65,22 @@ def get_cached_response(cache_key: str) -> Optional[Any]:
     return None
 
 
+def get_cache_timestamp(cache_key: str) -> Optional[float]:
+    """
+    Get the time a cached response was stored, to tell whether it was replaced.
+
+    Args:
+        cache_key: The cache key to look up
+
+    Returns:
+        Unix timestamp of the entry, None if it isn't cached
+    """
+    with _cache_lock:
+        if cache_key in _cache:
+            return _cache[cache_key]["timestamp"]
+    return None
+
+
 def is_cache_valid(cache_key: str) -> bool:
     """
     Check if cached response exists and is still valid (not expired).
@@ -78,11 +107,14 @@ def set_cached_response(cache_key: str, data: Any) -> None:
         cache_key: The cache key to store under
         data: The data to cache
     """
+    size = memory.estimate_size(data)
     with _cache_lock:
         _cache[cache_key] = {
             "data": data,
-            "timestamp": time.time()
+            "timestamp": time.time(),
+            "size": size,
         }
+    memory.enforce_budget()
 
 
 def _is_rate_limited(cache_key: str) -> bool:
@@ -135,12 +167,27 @@ def get_cached_or_fetch(cache_key: str, fetch_func, *args, **kwargs) -> Any:
         Cached or freshly fetched data
         
     Raises:
+        RateLimitCooldown: If the API answered 429 recently and nothing is cached
         Exception: If fetch fails and no cached data is available
     """
     # First, check if we have valid cached data
     if is_cache_valid(cache_key):
         cached_data = get_cached_response(cache_key)
         if cached_data is not None:
+            metrics.cache_events.inc("crypto", "hit")
+            return cached_data
+
+    # Entries restored from a snapshot are served once while they refresh in the background
+    with _cache_lock:
+        is_warm = cache_key in _warm_keys
+        _warm_keys.discard(cache_key)
+    if is_warm:
+        cached_data = get_cached_response(cache_key)
+        if cached_data is not None:
+            metrics.cache_events.inc("crypto", "stale")
+            threading.Thread(
+                target=_refresh_in_background, args=(cache_key, fetch_func, args, kwargs), daemon=True
+            ).start()
             return cached_data
     
     # Check if we're in rate limit cooldown
@@ -148,31 +195,128 @@ def get_cached_or_fetch(cache_key: str, fetch_func, *args, **kwargs) -> Any:
         cached_data = get_cached_response(cache_key)
         if cached_data is not None:
             # Return expired cache rather than hitting the API again
+            metrics.cache_events.inc("crypto", "stale")
             return cached_data
         # No cache available, but we're rate limited - raise an informative error
-        raise Exception("Rate limited and no cached data available")
+        raise RateLimitCooldown("Rate limited and no cached data available")
     
-    # Try to get expired cache as fallback
-    cached_data = get_cached_response(cache_key)
-    
-    try:
-        fresh_data = fetch_func(*args, **kwargs)
-        set_cached_response(cache_key, fresh_data)
-        # Clear rate limit error if we successfully fetched
-        with _cache_lock:
-            _rate_limit_errors.pop(cache_key, None)
-        return fresh_data
-    except Exception as e:
-        # Check if this is a 429 error
-        if _is_429_error(e):
-            _record_rate_limit_error(cache_key)
-            # Return cached data if available (even if expired)
-            if cached_data is not None:
-                return cached_data
-        else:
-            # For other errors, also try to return cached data
+    with _fetch_locks.hold(cache_key):
+        # Another request may have fetched it while we were waiting
+        if is_cache_valid(cache_key):
+            cached_data = get_cached_response(cache_key)
             if cached_data is not None:
+                metrics.cache_events.inc("crypto", "hit")
                 return cached_data
-        # Re-raise if no cached data available
-        raise e
 
+        # Try to get expired cache as fallback
+        cached_data = get_cached_response(cache_key)
+        metrics.cache_events.inc("crypto", "miss")
+    
+        try:
+            fresh_data = fetch_func(*args, **kwargs)
+            set_cached_response(cache_key, fresh_data)
+            # Clear rate limit error if we successfully fetched
+            with _cache_lock:
+                _rate_limit_errors.pop(cache_key, None)
+            return fresh_data
+        except Exception as e:
+            # Check if this is a 429 error
+            if _is_429_error(e):
+                _record_rate_limit_error(cache_key)
+                # Return cached data if available (even if expired)
+                if cached_data is not None:
+                    metrics.cache_events.inc("crypto", "stale")
+                    return cached_data
+            else:
+                # For other errors, also try to return cached data
+                if cached_data is not None:
+                    metrics.cache_events.inc("crypto", "stale")
+                    return cached_data
+            # Re-raise if no cached data available
+            raise e
+
+
+def _refresh_in_background(cache_key: str, fetch_func, args: tuple, kwargs: dict) -> None:
+    """Refresh a warm-start entry without blocking the request that served it."""
+    try:
+        get_cached_or_fetch(cache_key, fetch_func, *args, **kwargs)
+    except Exception:
+        pass
+
+
+def export_entries() -> Dict[str, Dict[str, Any]]:
+    """
+    Copy all cache entries for persisting them in a snapshot.
+
+    Returns:
+        Dictionary of {cache_key: {"data": ..., "timestamp": ...}}
+    """
+    with _cache_lock:
+        return {
+            key: {"data": item["data"], "timestamp": item["timestamp"]}
+            for key, item in _cache.items()
+        }
+
+
+def restore_entries(entries: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Restore cache entries from a snapshot, keeping their original timestamps.
+    Expired entries are served once and refreshed in the background.
+
+    Args:
+        entries: Dictionary of {cache_key: {"data": ..., "timestamp": ...}}
+    """
+    with _cache_lock:
+        for key, item in entries.items():
+            if key not in _cache:
+                _cache[key] = {
+                    "data": item["data"],
+                    "timestamp": item["timestamp"],
+                    "size": memory.estimate_size(item["data"]),
+                }
+                _warm_keys.add(key)
+    memory.enforce_budget()
+
+
+def get_cache_stats() -> Dict[str, float]:
+    """
+    Report the size of the cache for the memory governor and metrics.
+
+    Returns:
+        Dictionary with the number of entries and their estimated size in bytes
+    """
+    with _cache_lock:
+        return {
+            "entries": len(_cache),
+            "bytes": sum(item["size"] for item in _cache.values()),
+        }
+
+
+def evict_entries(bytes_to_free: int) -> int:
+    """
+    Remove entries until the requested number of bytes is freed.
+    Expired entries go first, then the oldest valid ones.
+
+    Args:
+        bytes_to_free: Number of bytes the memory governor wants back
+
+    Returns:
+        Number of bytes freed
+    """
+    now = time.time()
+    freed = 0
+    with _cache_lock:
+        candidates = sorted(
+            _cache.items(),
+            key=lambda pair: (now - pair[1]["timestamp"] < CACHE_EXPIRATION_SECONDS, pair[1]["timestamp"]),
+        )
+        for key, item in candidates:
+            if freed >= bytes_to_free:
+                break
+            del _cache[key]
+            _warm_keys.discard(key)
+            freed += item["size"]
+    return freed
+
+
+memory.register_cache("crypto", memory.PRIORITY_RATE_LIMITED, get_cache_stats, evict_entries)
@@ -1,53 +1,85 @@
-import requests
-import xml.etree.ElementTree as ET
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from app.config.config import settings
+from app.modules import feeds, snapshot
 from flask import jsonify
 
-def _get_daily_word():
-    """Fetch the current Merriam-Webster Word of the Day and its short definition."""
+# Until the feed has today's word, it is checked again after this many seconds
+RECHECK_SECONDS = 900
+
+
+def _get_timezone(tz_name: str) -> ZoneInfo:
+    try:
+        return ZoneInfo(tz_name)
+    except (ZoneInfoNotFoundError, ValueError):
+        print(f"Unknown timezone {tz_name}, using UTC")
+        return ZoneInfo("UTC")
+
+
+def _today(tz_name: str) -> str:
+    return datetime.fromtimestamp(time.time(), _get_timezone(tz_name)).date().isoformat()
+
+
+def _get_daily_word(tz_name: str):
+    """Fetch the current Merriam-Webster Word of the Day, its short definition and its date."""
     try:
-        url = "https://www.merriam-webster.com/wotd/feed/rss2"
-        response = requests.get(url)
-        response.raise_for_status()
-
-        root = ET.fromstring(response.content)
-
-        main_element = root.find(".//channel/item")
-        if main_element is None:
-            return None, None
-
-        title = main_element.findtext("title")
-        word = title.strip() if title else None
-
-        namespaces = {'merriam': 'http://www.merriam-webster.com/2006/rss'}
-        shortdef = main_element.findtext("merriam:shortdef", namespaces=namespaces)
-        
-        if shortdef is None:
-            for elem in main_element.iter():
-                if 'shortdef' in elem.tag:
-                    shortdef = elem.text
-                    break
-        
-        definition = shortdef.strip() if shortdef else None
-
-        if word:
-            return word, definition
-        else:
-            return None, None
-            
+        items = feeds.get_latest_items("merriam-webster", settings.daily_word_feed_url, limit=1)
     except Exception as e:
         print(f"Error fetching daily word: {str(e)}")
-        return None, None
+        return None, None, None
+    if not items:
+        return None, None, None
 
-def return_daily_word():
-    word, definition = _get_daily_word()
-    if word:
-        return jsonify({
-            "daily_word": word,
-            "definition": definition
-        }), 200
-    else:
+    item = items[0]
+    word = item.get("title") or None
+    definition = item.get("shortdef") or None
+    published = feeds.get_published(item)
+    # The word's day in the frame's timezone; feeds without dates count as today's
+    day = published.astimezone(_get_timezone(tz_name)).date().isoformat() if published else _today(tz_name)
+    return word, definition, day
+
+def _fetch_daily_word(tz_name: str) -> dict:
+    word, definition, day = _get_daily_word(tz_name)
+    if not word:
+        raise ValueError("Couldn't fetch the word of the day.")
+    return {
+        "daily_word": word,
+        "definition": definition,
+        "date": day,
+    }
+
+def _daily_word_snapshot_name(tz_name: str) -> str:
+    return f"daily-word:{tz_name}"
+
+def peek_daily_word(tz_name: str) -> Optional[Tuple[dict, bool]]:
+    """Return the stored word of the day as (payload, is_fresh), without fetching."""
+    data = snapshot.get_snapshot(_daily_word_snapshot_name(tz_name))
+    if data is None:
+        return None
+    return data, data.get("date") == _today(tz_name)
+
+def return_daily_word(tz_name: str):
+    """
+    Return the word of the day. It is memoized per calendar day in the
+    frame's timezone, so the feed is fetched once a day (plus cheap
+    conditional re-checks while the feed still has yesterday's word).
+
+    Args:
+        tz_name: IANA timezone of the frame, e.g. "Europe/Berlin"
+    """
+    name = _daily_word_snapshot_name(tz_name)
+    stored = snapshot.get_snapshot(name)
+    if stored is not None and stored.get("date") == _today(tz_name):
+        return jsonify(stored), 200
+
+    try:
+        data = snapshot.serve_with_snapshot(name, lambda: _fetch_daily_word(tz_name), max_age=RECHECK_SECONDS)
+        return jsonify(data), 200
+    except ValueError:
         return jsonify({
             "error": "Couldn't fetch the word of the day.",
             "daily_word": None,
             "definition": None
-        }), 500
\ No newline at end of file
+        }), 500
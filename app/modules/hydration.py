@@ -0,0 +1,65 @@
+"""
+Initial widget data for the index page.
+Collects what the in-memory snapshots and caches already hold for the widgets
+of a frame, keyed by the API path that serves it, so the page can render
+before its first request. Never calls an upstream.
+"""
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple
+from app.config.profiles import FrameProfile
+from app.modules import calendar, crypto, daily_word, weather
+
+logger = logging.getLogger(__name__)
+
+Peek = Callable[[], Optional[Tuple[Any, bool]]]
+
+
+def _get_peeks(profile: FrameProfile) -> Dict[str, Peek]:
+    peeks: Dict[str, Peek] = {
+        "/api/weather/first-city": lambda: weather.peek_current_weather(profile.first_city),
+        "/api/forecast/first-city": lambda: weather.peek_weather_forecast(profile.first_city),
+        "/api/weather/second-city": lambda: weather.peek_current_weather(profile.second_city),
+        "/api/forecast/second-city": lambda: weather.peek_weather_forecast(profile.second_city),
+        "/api/calendar": lambda: calendar.peek_calendar_events(profile.calendars, profile.timezone),
+        "/api/crypto-config": lambda: crypto.peek_coin_config(profile.crypto_coin_ids),
+        "/api/crypto-price": lambda: crypto.peek_current_crypto_price(
+            profile.crypto_coin_ids, profile.crypto_vs_currency),
+        "/daily-word": lambda: daily_word.peek_daily_word(profile.timezone),
+    }
+    if profile.crypto_chart_mode == "sparkline":
+        # The chart is an <img> then, the page doesn't need the series
+        return peeks
+    for coin_id in profile.crypto_coin_ids.split(","):
+        coin_id = coin_id.strip()
+        if coin_id:
+            peeks[f"/api/crypto-history/{coin_id}"] = (
+                lambda coin_id=coin_id: crypto.peek_historical_crypto_price(
+                    coin_id, profile.crypto_vs_currency, profile.crypto_graph_history_days)
+            )
+    return peeks
+
+
+def get_initial_data(profile: FrameProfile) -> Dict[str, Dict[str, Any]]:
+    """
+    Get the stored payload of every widget of a frame.
+
+    Args:
+        profile: The frame's profile
+
+    Returns:
+        Dictionary of {api_path: {"data": payload, "fresh": bool}}. Widgets
+        without stored data are left out; "fresh" tells the page whether it
+        still has to fetch right away.
+    """
+    initial_data = {}
+    for path, peek in _get_peeks(profile).items():
+        try:
+            peeked = peek()
+        except Exception as e:
+            logger.warning("Could not read initial data for %s: %s", path, e)
+            continue
+        if peeked is None:
+            continue
+        data, fresh = peeked
+        initial_data[path] = {"data": data, "fresh": fresh}
+    return initial_data
@@ -0,0 +1,307 @@
+"""
+Line-oriented scanner for iCalendar (RFC 5545) feeds.
+Reads a feed line by line and keeps only the properties the calendar widget
+shows (DTSTART, DTEND/DURATION, SUMMARY, UID, RRULE and the recurrence
+bookkeeping). Events that start before the cutoff and don't recur are
+dropped when their END:VEVENT is reached, before anything is built for them,
+so multi-year feeds cost little more than reading them.
+
+Recurring events are expanded with python-dateutil. TZID parameters are
+resolved through zoneinfo; VTIMEZONE definitions are not interpreted.
+All-day and floating times are returned as naive datetimes (local time of
+whoever displays them).
+"""
+import logging
+import re
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from functools import lru_cache
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from dateutil.rrule import rruleset, rrulestr
+
+logger = logging.getLogger(__name__)
+
+# Properties kept per VEVENT; everything else is skipped without parsing
+WANTED = {"DTSTART", "DTEND", "DURATION", "SUMMARY", "UID", "RRULE", "RECURRENCE-ID", "EXDATE"}
+
+_DURATION_RE = re.compile(
+    r"^([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$"
+)
+
+# A property as (parameters, value)
+Property = Tuple[Dict[str, str], str]
+
+
+def iter_lines(stream: IO[bytes]) -> Iterator[str]:
+    """
+    Yield the unfolded content lines of a feed.
+
+    Args:
+        stream: Binary file-like object with the feed
+
+    Yields:
+        Content lines without line breaks, continuation lines joined
+    """
+    pending = None
+    for raw in stream:
+        line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+        if line[:1] in (" ", "\t"):
+            if pending is not None:
+                pending += line[1:]
+            continue
+        if pending is not None:
+            yield pending
+        pending = line
+    if pending is not None:
+        yield pending
+
+
+def _property_name(line: str) -> str:
+    end = len(line)
+    for separator in (";", ":"):
+        index = line.find(separator)
+        if index != -1 and index < end:
+            end = index
+    return line[:end].upper()
+
+
+def _parse_property(line: str, name: str) -> Property:
+    """Split "NAME;PARAM=x;PARAM="a:b":value" into its parameters and value."""
+    params: Dict[str, str] = {}
+    index = len(name)
+    while index < len(line) and line[index] == ";":
+        end = index + 1
+        in_quotes = False
+        while end < len(line) and (in_quotes or line[end] not in ";:"):
+            if line[end] == '"':
+                in_quotes = not in_quotes
+            end += 1
+        key, _, value = line[index + 1:end].partition("=")
+        params[key.upper()] = value.strip('"')
+        index = end
+    return params, line[index + 1:]
+
+
+def _unescape(text: str) -> str:
+    return (text.replace("\\n", "\n").replace("\\N", "\n")
+            .replace("\\,", ",").replace("\\;", ";").replace("\\\\", "\\"))
+
+
+@lru_cache(maxsize=64)
+def get_timezone(tzid: str) -> Optional[tzinfo]:
+    """
+    Resolve a TZID parameter to a timezone.
+
+    Args:
+        tzid: e.g. "Europe/Berlin" or "/mozilla.org/20050126_1/Europe/Berlin"
+
+    Returns:
+        The timezone, or None if it isn't an IANA name
+    """
+    candidates = [tzid, "/".join(tzid.strip("/").split("/")[-2:])]
+    for candidate in candidates:
+        try:
+            return ZoneInfo(candidate)
+        except (ZoneInfoNotFoundError, ValueError):
+            continue
+    return None
+
+
+def parse_datetime(prop: Property, default_tz: tzinfo):
+    """
+    Parse a DATE or DATE-TIME value.
+
+    Args:
+        prop: (parameters, value) of a DTSTART, DTEND, RECURRENCE-ID or EXDATE line
+        default_tz: Used for TZIDs that can't be resolved
+
+    Returns:
+        A date for all-day values, an aware datetime for UTC and TZID values,
+        a naive datetime for floating values
+    """
+    params, value = prop
+    value = value.strip()
+    if params.get("VALUE") == "DATE" or len(value) == 8:
+        return date(int(value[0:4]), int(value[4:6]), int(value[6:8]))
+
+    parsed = datetime.strptime(value[:15], "%Y%m%dT%H%M%S")
+    if value.endswith("Z"):
+        return parsed.replace(tzinfo=timezone.utc)
+    if "TZID" in params:
+        return parsed.replace(tzinfo=get_timezone(params["TZID"]) or default_tz)
+    return parsed
+
+
+def parse_duration(value: str) -> Optional[timedelta]:
+    """Parse an RFC 5545 duration such as "PT1H30M" or "P1D"."""
+    match = _DURATION_RE.match(value.strip())
+    if match is None:
+        return None
+    sign, weeks, days, hours, minutes, seconds = match.groups()
+    duration = timedelta(
+        weeks=int(weeks or 0), days=int(days or 0),
+        hours=int(hours or 0), minutes=int(minutes or 0), seconds=int(seconds or 0),
+    )
+    return -duration if sign == "-" else duration
+
+
+def _as_datetime(value) -> datetime:
+    """Turn all-day dates into naive midnight datetimes."""
+    if isinstance(value, datetime):
+        return value
+    return datetime(value.year, value.month, value.day)
+
+
+def _instant(value: datetime, default_tz: tzinfo) -> datetime:
+    """Aware datetime for comparing and sorting; naive values are in default_tz."""
+    return value if value.tzinfo is not None else value.replace(tzinfo=default_tz)
+
+
+def _format_recurrence_id(value: datetime, all_day: bool) -> str:
+    """Format an occurrence's start like a RECURRENCE-ID value."""
+    if all_day:
+        return value.strftime("%Y%m%d")
+    if value.tzinfo is timezone.utc:
+        return value.strftime("%Y%m%dT%H%M%SZ")
+    return value.strftime("%Y%m%dT%H%M%S")
+
+
+def scan_vevents(stream: IO[bytes], cutoff: datetime) -> Tuple[List[Dict[str, Property]], Dict[str, List[Property]]]:
+    """
+    Collect the VEVENTs that may still matter at the cutoff.
+
+    Args:
+        stream: Binary file-like object with the feed
+        cutoff: Aware datetime; non-recurring events starting before it are dropped
+
+    Returns:
+        Tuple of (events as {property name: Property}, with EXDATE as a list,
+        and {uid: [RECURRENCE-ID properties]} of all overridden occurrences)
+    """
+    # Events whose DTSTART date is before this can't reach the cutoff in any timezone
+    quick_cutoff = (cutoff - timedelta(days=2)).strftime("%Y%m%d")
+    events: List[Dict[str, Property]] = []
+    overrides: Dict[str, List[Property]] = {}
+    current: Optional[Dict] = None
+    # Depth of components nested in the current event (VALARM), whose lines are skipped
+    nested = 0
+
+    for line in iter_lines(stream):
+        if current is None:
+            if line.upper() == "BEGIN:VEVENT":
+                current, nested = {"EXDATE": []}, 0
+            continue
+        if line[:6].upper() == "BEGIN:":
+            nested += 1
+            continue
+        if nested:
+            if line[:4].upper() == "END:":
+                nested -= 1
+            continue
+        if line.upper() == "END:VEVENT":
+            event, current = current, None
+            if "UID" in event and "RECURRENCE-ID" in event:
+                overrides.setdefault(event["UID"][1], []).append(event["RECURRENCE-ID"])
+            if "DTSTART" not in event:
+                continue
+            if "RRULE" not in event and event["DTSTART"][1][:8] < quick_cutoff:
+                continue
+            events.append(event)
+            continue
+
+        name = _property_name(line)
+        if name not in WANTED:
+            continue
+        prop = _parse_property(line, name)
+        if name == "EXDATE":
+            current["EXDATE"].append(prop)
+        elif name not in current:
+            current[name] = prop
+    return events, overrides
+
+
+def _like(value: datetime, reference: datetime, default_tz: tzinfo) -> datetime:
+    """Make a datetime naive or aware like the reference, so dateutil can compare them."""
+    if reference.tzinfo is None and value.tzinfo is not None:
+        return value.astimezone(default_tz).replace(tzinfo=None)
+    if reference.tzinfo is not None and value.tzinfo is None:
+        return value.replace(tzinfo=default_tz)
+    return value
+
+
+def _occurrences(event: Dict[str, Property], start, cutoff: datetime, default_tz: tzinfo,
+                 overridden: List[Property], limit: int) -> List[datetime]:
+    """Expand an RRULE into its next starts at or after the cutoff."""
+    dtstart = _as_datetime(start)
+    rule = event["RRULE"][1]
+    if dtstart.tzinfo is None:
+        # dateutil rejects a UTC UNTIL with floating or all-day starts
+        rule = re.sub(r"(UNTIL=\d{8}T\d{6})Z", r"\1", rule)
+    try:
+        rules = rruleset()
+        rules.rrule(rrulestr(f"RRULE:{rule}", dtstart=dtstart))
+        for params, value in event["EXDATE"] + overridden:
+            for single in value.split(","):
+                excluded = _as_datetime(parse_datetime((params, single), default_tz))
+                rules.exdate(_like(excluded, dtstart, default_tz))
+        return list(rules.xafter(_like(cutoff, dtstart, default_tz), count=limit, inc=True))
+    except (ValueError, TypeError) as e:
+        logger.warning("Skipping recurring event %s with unsupported rule: %s", event.get("UID"), e)
+        return []
+
+
+def upcoming_events(stream: IO[bytes], cutoff: datetime, max_events: int = 5,
+                    default_tz: tzinfo = timezone.utc) -> List[Dict]:
+    """
+    Get the next events of a feed, recurring ones expanded.
+
+    Args:
+        stream: Binary file-like object with the feed
+        cutoff: Aware datetime; events starting before it are left out
+        max_events: Number of events to return
+        default_tz: Timezone of floating times and unknown TZIDs
+
+    Returns:
+        Up to max_events dicts, sorted by start, with "uid",
+        "recurrence_id" (None for single events), "name", "begin", "end"
+        (datetimes, naive for all-day and floating times) and "all_day"
+    """
+    events, overrides = scan_vevents(stream, cutoff)
+    upcoming = []
+    for event in events:
+        try:
+            start = parse_datetime(event["DTSTART"], default_tz)
+            end = parse_datetime(event["DTEND"], default_tz) if "DTEND" in event else None
+        except ValueError:
+            continue
+        all_day = not isinstance(start, datetime)
+        if end is not None:
+            length = _as_datetime(end) - _as_datetime(start)
+        elif "DURATION" in event:
+            length = parse_duration(event["DURATION"][1]) or timedelta(0)
+        else:
+            length = timedelta(days=1) if all_day else timedelta(0)
+
+        uid = event["UID"][1] if "UID" in event else None
+        name = _unescape(event["SUMMARY"][1]) if "SUMMARY" in event else ""
+        if "RRULE" in event and "RECURRENCE-ID" not in event:
+            starts = _occurrences(event, start, cutoff, default_tz, overrides.get(uid, []), max_events)
+            recurrence_ids = [_format_recurrence_id(begin, all_day) for begin in starts]
+        else:
+            starts = [_as_datetime(start)]
+            recurrence_ids = [event["RECURRENCE-ID"][1] if "RECURRENCE-ID" in event else None]
+
+        for begin, recurrence_id in zip(starts, recurrence_ids):
+            if _instant(begin, default_tz) < cutoff:
+                continue
+            upcoming.append({
+                "uid": uid,
+                "recurrence_id": recurrence_id,
+                "name": name,
+                "begin": begin,
+                "end": begin + length if end is not None or "DURATION" in event or all_day else None,
+                "all_day": all_day,
+            })
+
+    upcoming.sort(key=lambda item: _instant(item["begin"], default_tz))
+    return upcoming[:max_events]
@@ -0,0 +1,44 @@
+"""
+Per-key locks for single-flight fetches.
+A key's lock only exists while a caller holds or waits for it, so the
+number of locks is bounded by the requests in flight, not by the number of
+keys ever fetched (cache keys, snapshot names, asset URLs).
+"""
+from contextlib import contextmanager
+from threading import Lock
+from typing import Dict, List
+
+
+class KeyedLocks:
+    """Locks by key that are removed again once nobody uses them."""
+
+    def __init__(self):
+        # {key: [lock, number of callers holding or waiting for it]}
+        self._locks: Dict[str, List] = {}
+        self._lock = Lock()
+
+    @contextmanager
+    def hold(self, key: str):
+        """
+        Hold the lock of a key for the duration of the block.
+
+        Args:
+            key: e.g. a cache key; callers with the same key run one at a time
+        """
+        with self._lock:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [Lock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._locks)
@@ -0,0 +1,244 @@
+"""
+Memory governor.
+Every in-memory cache registers here with a function reporting its size in
+bytes and a function that frees entries. When the caches together exceed the
+budget, they are asked to free memory in order of priority, lowest first.
+Large blobs (images, raw feeds) are spooled to disk instead of being held in
+memory while they are processed.
+"""
+import os
+import sys
+import tempfile
+from threading import Lock
+from typing import Any, Callable, Dict, IO, List, Optional
+from app.config.config import settings
+from app.modules import metrics
+
+# Eviction priorities: caches with lower values are evicted first
+PRIORITY_REFETCHABLE = 10  # data that can be fetched again without limits
+PRIORITY_RATE_LIMITED = 20  # data whose upstream enforces a rate limit
+PRIORITY_FALLBACK = 30  # last good payloads that bridge upstream outages
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _RegisteredCache:
+    def __init__(self, name: str, priority: int,
+                 stats_func: Callable[[], Dict[str, int]], evict_func: Callable[[int], int]):
+        self.name = name
+        self.priority = priority
+        self.stats_func = stats_func
+        self.evict_func = evict_func
+        self.evicted_bytes = 0
+        self.evicted_entries = 0
+
+
+_caches: Dict[str, _RegisteredCache] = {}
+_spill_stats = {"blobs": 0, "spilled_blobs": 0, "spilled_bytes": 0}
+_governor_lock = Lock()
+# Held while evicting, so concurrent inserts don't evict twice for the same excess
+_enforce_lock = Lock()
+
+
+def register_cache(name: str, priority: int, stats_func: Callable[[], Dict[str, int]],
+                   evict_func: Callable[[int], int]) -> None:
+    """
+    Put a cache under the governor's budget.
+
+    Args:
+        name: Cache name as shown in reports and metrics
+        priority: Eviction priority, one of the PRIORITY_* constants
+        stats_func: Function returning {"entries": int, "bytes": int}
+        evict_func: Function freeing at least the given number of bytes if it
+            can, least valuable entries first, returning the bytes freed
+    """
+    with _governor_lock:
+        _caches[name] = _RegisteredCache(name, priority, stats_func, evict_func)
+
+
+def estimate_size(obj: Any) -> int:
+    """
+    Estimate the memory used by a JSON-like object, including its contents.
+
+    Args:
+        obj: Dicts, lists, tuples and scalars
+
+    Returns:
+        Estimated size in bytes
+    """
+    size = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+    return size
+
+
+def get_budget_bytes() -> int:
+    return settings.memory_budget_mb * 1024 * 1024
+
+
+def _get_cache_stats() -> Dict[str, Dict[str, int]]:
+    with _governor_lock:
+        caches = list(_caches.values())
+    stats = {}
+    for cache in caches:
+        try:
+            stats[cache.name] = cache.stats_func()
+        except Exception:
+            stats[cache.name] = {"entries": 0, "bytes": 0}
+    return stats
+
+
+def enforce_budget() -> int:
+    """
+    Evict cache entries until all caches together fit into the budget.
+    Must not be called while holding a cache's lock.
+
+    Returns:
+        Number of bytes freed
+    """
+    if not _enforce_lock.acquire(blocking=False):
+        return 0
+    try:
+        stats = _get_cache_stats()
+        excess = sum(item["bytes"] for item in stats.values()) - get_budget_bytes()
+        if excess <= 0:
+            return 0
+
+        with _governor_lock:
+            caches = sorted(_caches.values(), key=lambda cache: cache.priority)
+        freed = 0
+        for cache in caches:
+            if freed >= excess:
+                break
+            before = stats.get(cache.name, {}).get("entries", 0)
+            cache_freed = cache.evict_func(excess - freed)
+            evicted = max(before - cache.stats_func()["entries"], 0)
+            with _governor_lock:
+                cache.evicted_bytes += cache_freed
+                cache.evicted_entries += evicted
+            metrics.cache_events.inc(cache.name, "evicted", amount=evicted)
+            freed += cache_freed
+        return freed
+    finally:
+        _enforce_lock.release()
+
+
+def _get_spill_dir() -> Optional[str]:
+    if not settings.memory_spill_dir:
+        return None
+    os.makedirs(settings.memory_spill_dir, exist_ok=True)
+    return settings.memory_spill_dir
+
+
+def spool_file() -> IO[bytes]:
+    """
+    Create a file for a blob that stays in memory while it is small and is
+    moved to the spill directory once it grows past the spill threshold.
+
+    Returns:
+        A binary SpooledTemporaryFile, deleted when closed
+    """
+    return tempfile.SpooledTemporaryFile(
+        max_size=settings.memory_spill_threshold_kb * 1024, mode="w+b", dir=_get_spill_dir(),
+    )
+
+
+def finish_spool(fp: IO[bytes]) -> int:
+    """
+    Record a completely written spool file and rewind it for reading.
+
+    Args:
+        fp: File returned by spool_file
+
+    Returns:
+        Size of the blob in bytes
+    """
+    size = fp.tell()
+    fp.seek(0)
+    with _governor_lock:
+        _spill_stats["blobs"] += 1
+        if size > settings.memory_spill_threshold_kb * 1024:
+            _spill_stats["spilled_blobs"] += 1
+            _spill_stats["spilled_bytes"] += size
+    return size
+
+
+def spool_chunks(chunks) -> IO[bytes]:
+    """
+    Write an iterable of byte chunks (e.g. a streamed response) to a spool file.
+
+    Args:
+        chunks: Iterable of bytes
+
+    Returns:
+        The spool file, rewound for reading
+    """
+    fp = spool_file()
+    try:
+        for chunk in chunks:
+            if chunk:
+                fp.write(chunk)
+    except Exception:
+        fp.close()
+        raise
+    finish_spool(fp)
+    return fp
+
+
+def get_process_rss() -> Optional[int]:
+    """Current resident set size of the process in bytes (Linux only)."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def get_memory_report() -> Dict[str, Any]:
+    """
+    Get the memory usage of every registered cache and the spill statistics.
+
+    Returns:
+        Dictionary for the /api/debug/memory endpoint
+    """
+    stats = _get_cache_stats()
+    with _governor_lock:
+        caches: List[_RegisteredCache] = sorted(_caches.values(), key=lambda cache: cache.priority)
+        spill = dict(_spill_stats)
+        cache_report = {
+            cache.name: {
+                "priority": cache.priority,
+                "entries": stats.get(cache.name, {}).get("entries", 0),
+                "bytes": stats.get(cache.name, {}).get("bytes", 0),
+                "evicted_entries": cache.evicted_entries,
+                "evicted_bytes": cache.evicted_bytes,
+            }
+            for cache in caches
+        }
+    return {
+        "budget_bytes": get_budget_bytes(),
+        "used_bytes": sum(item["bytes"] for item in stats.values()),
+        "process_rss_bytes": get_process_rss(),
+        "caches": cache_report,
+        "spill": {
+            "dir": settings.memory_spill_dir or tempfile.gettempdir(),
+            "threshold_bytes": settings.memory_spill_threshold_kb * 1024,
+            **spill,
+        },
+    }
+
+
+metrics.register_gauge("frame_cache_entries", "Number of entries in in-memory caches", "cache",
+                       lambda: {name: item["entries"] for name, item in _get_cache_stats().items()})
+metrics.register_gauge("frame_cache_bytes", "Estimated size of in-memory caches in bytes", "cache",
+                       lambda: {name: item["bytes"] for name, item in _get_cache_stats().items()})
@@ -0,0 +1,175 @@
+"""
+In-process metrics exported in the Prometheus text format.
+Counters and histograms are keyed by label values; gauges are computed
+on scrape through registered callbacks.
+"""
+import time
+from threading import Lock
+from typing import Callable, Dict, List, Tuple
+
+_metrics_lock = Lock()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        with _metrics_lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values: str) -> float:
+        with _metrics_lock:
+            return self._values.get(label_values, 0.0)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with _metrics_lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative histogram with labels and fixed buckets."""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        # {label_values: {"counts": [...], "sum": ..., "count": ...}}
+        self._values: Dict[Tuple[str, ...], Dict] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        with _metrics_lock:
+            series = self._values.get(label_values)
+            if series is None:
+                series = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._values[label_values] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with _metrics_lock:
+            for label_values, series in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, series["counts"]):
+                    labels = _format_labels(self.label_names + ("le",), label_values + (str(bound),))
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(self.label_names + ("le",), label_values + ("+Inf",))
+                lines.append(f"{self.name}_bucket{labels} {series['count']}")
+                labels = _format_labels(self.label_names, label_values)
+                lines.append(f"{self.name}_sum{labels} {series['sum']}")
+                lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+#REQUESTS -----------------------------------------------------------------------
+request_latency = Histogram(
+    "frame_request_duration_seconds", "Latency of requests served by the frame",
+    ("route", "method", "status"),
+)
+
+admission_wait = Histogram(
+    "frame_admission_wait_seconds", "Time requests waited for a slot in their admission pool", ("pool",),
+)
+admission_rejected = Counter(
+    "frame_admission_rejected_total", "Requests shed with 503 (queue_full, timeout)", ("pool", "reason"),
+)
+
+#UPSTREAMS -----------------------------------------------------------------------
+upstream_latency = Histogram(
+    "frame_upstream_duration_seconds", "Latency of calls to upstream services", ("upstream",),
+)
+upstream_errors = Counter(
+    "frame_upstream_errors_total", "Failed calls to upstream services", ("upstream",),
+)
+upstream_rate_limited = Counter(
+    "frame_upstream_rate_limited_total", "Upstream calls answered with 429", ("upstream",),
+)
+upstream_skipped = Counter(
+    "frame_upstream_skipped_total", "Upstream calls not made (circuit_open, deadline)", ("upstream", "reason"),
+)
+nextcloud_bytes = Counter(
+    "frame_nextcloud_downloaded_bytes_total", "Bytes downloaded from Nextcloud",
+)
+
+#CACHES -----------------------------------------------------------------------
+cache_events = Counter(
+    "frame_cache_events_total", "Cache lookups by outcome (hit, miss, stale) and evictions", ("cache", "outcome"),
+)
+
+_COLLECTORS = [request_latency, admission_wait, admission_rejected, upstream_latency, upstream_errors, upstream_rate_limited,
+               upstream_skipped, nextcloud_bytes, cache_events]
+
+# Gauges computed on scrape: {name: (help_text, label_name, [callbacks])}
+_gauges: Dict[str, Tuple[str, str, List[Callable[[], Dict[str, float]]]]] = {}
+
+
+def register_gauge(name: str, help_text: str, label_name: str,
+                   callback: Callable[[], Dict[str, float]]) -> None:
+    """
+    Register a gauge that is evaluated every time metrics are rendered.
+    Several modules can register callbacks under the same name; their
+    values are merged.
+
+    Args:
+        name: Metric name
+        help_text: Description shown in the HELP line
+        label_name: Name of the single label the callback keys its values by
+        callback: Function returning {label_value: value}
+    """
+    with _metrics_lock:
+        if name not in _gauges:
+            _gauges[name] = (help_text, label_name, [])
+        _gauges[name][2].append(callback)
+
+
+def render_metrics() -> str:
+    """Render all metrics in the Prometheus text exposition format."""
+    lines = []
+    for collector in _COLLECTORS:
+        lines.extend(collector.render())
+    with _metrics_lock:
+        gauges = sorted((name, help_text, label_name, list(callbacks))
+                        for name, (help_text, label_name, callbacks) in _gauges.items())
+    for name, help_text, label_name, callbacks in gauges:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        values = {}
+        for callback in callbacks:
+            try:
+                values.update(callback())
+            except Exception:
+                continue
+        for label_value, value in sorted(values.items()):
+            lines.append(f"{name}{_format_labels((label_name,), (label_value,))} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def now() -> float:
+    """Monotonic clock used for all latency measurements."""
+    return time.perf_counter()
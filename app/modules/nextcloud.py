@@ -1,25 +1,43 @@
+import hashlib
+from typing import IO, TYPE_CHECKING, Optional
+from urllib.parse import urlsplit
 from app.config.config import settings
-from nc_py_api import Nextcloud
+from app.modules import memory, metrics, snapshot, startup, upstream
 import random
 
+if TYPE_CHECKING:
+    from nc_py_api import Nextcloud
+
 
 IMAGE_EXTENSIONS = {'.webp', '.jpg', '.jpeg', '.png'}
+# How long the folder listing is reused before listing the folder again
+INDEX_MAX_AGE_SECONDS = 600
+# Most slideshow slots a playlist request may ask for
+MAX_PLAYLIST_COUNT = 10
 
 
-def connect_to_nextcloud() -> Nextcloud:
+def connect_to_nextcloud() -> "Nextcloud":
     """Establish connection to Nextcloud instance."""
     if not settings.nextcloud_password:
         raise ValueError("nextcloud_password environment variable not set")
     
-    nc = Nextcloud(
+    # Calls made through this connection must finish within the request's deadline
+    timeouts = {}
+    remaining = upstream.get_call_timeout()
+    if remaining is not None:
+        timeouts = {"npa_timeout": remaining, "npa_timeout_dav": remaining}
+
+    # nc_py_api pulls in FastAPI, so it is only loaded when needed
+    nc = startup.lazy_import("nc_py_api").Nextcloud(
         nextcloud_url=settings.nextcloud_url,
         nc_auth_user=settings.nextcloud_user,
         nc_auth_pass=settings.nextcloud_password,
+        **timeouts,
     )
     return nc
 
 
-def list_files_in_folder(nc: Nextcloud, folder_path: str = "/") -> list:
+def list_files_in_folder(nc: "Nextcloud", folder_path: str = "/") -> list:
     """
     List all files and folders in a given path.
     
@@ -30,7 +48,8 @@ def list_files_in_folder(nc: Nextcloud, folder_path: str = "/") -> list:
     Returns:
         List of file/folder objects
     """
-    files = nc.files.listdir(folder_path)
+    with upstream.track("nextcloud", urlsplit(settings.nextcloud_url).hostname):
+        files = nc.files.listdir(folder_path)
     return files
 
 
@@ -47,51 +66,165 @@ def print_file_info(files: list) -> None:
         print(f"{file.name:<40} {file_type:<10} {size:<15} {modified}")
 
 
-def get_random_image() -> tuple[bytes, str] | None:
+def _image_id(name: str, etag: str, size: int) -> str:
+    """Id of a photo for URLs. Nextcloud gives every upload a new etag, so a replaced file gets a new id."""
+    return hashlib.sha1(f"{name}:{etag}:{size}".encode("utf-8")).hexdigest()[:16]
+
+
+def _content_type(name: str) -> str:
+    ext = name.lower().split('.')[-1]
+    content_types = {
+        'jpg': 'image/jpeg',
+        'jpeg': 'image/jpeg',
+        'png': 'image/png',
+        'webp': 'image/webp'
+    }
+    return content_types.get(ext, 'image/jpeg')
+
+
+def list_images(nc: "Nextcloud", folder_path: str) -> list:
+    """
+    List all image files in a folder.
+
+    Args:
+        nc: Nextcloud connection instance
+        folder_path: Path to the folder
+
+    Returns:
+        List of {"id", "name", "size"} of the image files
+    """
+    files = list_files_in_folder(nc, folder_path)
+    return [
+        {"id": _image_id(f.name, f.etag, f.info.size), "name": f.name, "size": f.info.size}
+        for f in files
+        if not f.is_dir and any(f.name.lower().endswith(ext) for ext in IMAGE_EXTENSIONS)
+    ]
+
+
+def _get_images(nc: "Nextcloud", folder_path: str) -> list:
+    """The folder's images, listed at most every INDEX_MAX_AGE_SECONDS."""
+    return snapshot.serve_with_snapshot(
+        f"nextcloud-images:{settings.nextcloud_url}{folder_path}",
+        lambda: list_images(nc, folder_path),
+        max_age=INDEX_MAX_AGE_SECONDS,
+    )
+
+
+def _download_image(nc: "Nextcloud", folder_path: str, name: str) -> tuple[IO[bytes], str, int]:
+    """Download an image into a spool file rather than a bytes object."""
+    file_path = f"{folder_path.rstrip('/')}/{name}"
+    image_file = memory.spool_file()
+    try:
+        with upstream.track("nextcloud", urlsplit(settings.nextcloud_url).hostname):
+            nc.files.download2stream(file_path, image_file)
+    except Exception:
+        image_file.close()
+        raise
+    size = memory.finish_spool(image_file)
+    metrics.nextcloud_bytes.inc(amount=size)
+    return image_file, _content_type(name), size
+
+
+def get_random_image(folder_path: str) -> tuple[IO[bytes], str, int] | None:
     """
     Get a random image from Nextcloud folder.
     
+    Args:
+        folder_path: Path to the folder with the frame's photos
+    
     Returns:
-        Tuple of (image_bytes, content_type) or None if no images found
+        Tuple of (image_file, content_type, size) or None if no images found.
+        Large images are spooled to disk; the caller closes the file.
     """
     try:
         nc = connect_to_nextcloud()
-        folder_path = settings.nextcloud_folder
-        files = list_files_in_folder(nc, folder_path)
-        
-        # Filter for image files only
-        image_files = [
-            f for f in files
-            if not f.is_dir and any(f.name.lower().endswith(ext) for ext in IMAGE_EXTENSIONS)
-        ]
+        images = _get_images(nc, folder_path)
         
-        if not image_files:
+        if not images:
             return None
         
         # Pick a random image
-        chosen_file = random.choice(image_files)
-        file_path = f"{folder_path.rstrip('/')}/{chosen_file.name}"
-        
-        # Download the image content
-        image_bytes = nc.files.download(file_path)
-        
-        # Determine content type
-        ext = chosen_file.name.lower().split('.')[-1]
-        content_types = {
-            'jpg': 'image/jpeg',
-            'jpeg': 'image/jpeg',
-            'png': 'image/png',
-            'webp': 'image/webp'
-        }
-        content_type = content_types.get(ext, 'image/jpeg')
-        
-        return image_bytes, content_type
+        chosen = random.choice(images)
+        return _download_image(nc, folder_path, chosen["name"])
         
     except Exception as e:
         print(f"Error getting random image: {e}")
         return None
 
 
+#SLIDESHOW -----------------------------------------------------------------------
+def _image_at_slot(images: list, folder_path: str, slot: int) -> dict:
+    """
+    Pick the photo of a time slot. Every cycle through the folder uses its own
+    shuffled order, so all photos are shown before one repeats, and frames
+    sharing a folder show the same photo at the same time.
+    """
+    ordered = sorted(images, key=lambda image: image["name"])
+    cycle, position = divmod(slot, len(ordered))
+    order = list(range(len(ordered)))
+    random.Random(f"{folder_path}:{cycle}").shuffle(order)
+    return ordered[order[position]]
+
+
+def get_playlist(folder_path: str, count: int, now: float) -> Optional[dict]:
+    """
+    Get the photos of the current and the next slideshow slots.
+
+    Args:
+        folder_path: Path to the folder with the frame's photos
+        count: Number of slots, starting with the current one
+        now: Current Unix time
+
+    Returns:
+        {"interval_seconds": int, "items": [{"id", "url", "size",
+        "content_type", "show_at"}]} or None if there are no images
+    """
+    try:
+        images = _get_images(connect_to_nextcloud(), folder_path)
+    except Exception as e:
+        print(f"Error listing background images: {e}")
+        return None
+    if not images:
+        return None
+
+    interval = settings.background_rotation_seconds
+    current_slot = int(now // interval)
+    items = []
+    for slot in range(current_slot, current_slot + count):
+        image = _image_at_slot(images, folder_path, slot)
+        items.append({
+            "id": image["id"],
+            "url": f"/api/background/{image['id']}",
+            "size": image["size"],
+            "content_type": _content_type(image["name"]),
+            "show_at": slot * interval,
+        })
+    return {"interval_seconds": interval, "items": items}
+
+
+def get_image(folder_path: str, image_id: str) -> tuple[IO[bytes], str, int] | None:
+    """
+    Get a photo of the folder by its id.
+
+    Args:
+        folder_path: Path to the folder with the frame's photos
+        image_id: Id from the playlist
+
+    Returns:
+        Tuple of (image_file, content_type, size), or None if the id is unknown
+        or the download failed. The caller closes the file.
+    """
+    try:
+        nc = connect_to_nextcloud()
+        image = next((image for image in _get_images(nc, folder_path) if image["id"] == image_id), None)
+        if image is None:
+            return None
+        return _download_image(nc, folder_path, image["name"])
+    except Exception as e:
+        print(f"Error getting background image {image_id}: {e}")
+        return None
+
+
 def main():
     """Main function to demonstrate Nextcloud file listing."""
     try:
@@ -0,0 +1,113 @@
+"""
+Response layer for the JSON APIs.
+Adds weak ETags, answers If-None-Match with 304, sets per-endpoint max-age
+and compresses larger bodies with brotli (if installed) or gzip.
+"""
+import gzip
+import hashlib
+from flask import Request, Response
+from app.config.config import settings
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+
+# Max-age per route prefix, matching how often each source refreshes
+MAX_AGE_BY_PREFIX = {
+    "/api/weather/": 900,
+    "/api/forecast/": 900,
+    "/api/calendar": 900,
+    "/api/crypto-price": 600,
+    "/api/crypto-history/": 600,
+    "/api/crypto-sparkline/": 600,
+    "/api/crypto-config": 3600,
+}
+# Also used for /daily-word: the word changes at the frame's local midnight,
+# so it is revalidated by ETag rather than cached for a fixed time
+DEFAULT_MAX_AGE = 60
+
+COMPRESSIBLE_MIMETYPES = {"application/json", "image/svg+xml", "text/plain"}
+
+
+def is_api_path(path: str) -> bool:
+    """Check if the path belongs to one of the JSON APIs handled by this layer."""
+    return path.startswith("/api/") or path == "/daily-word"
+
+
+def get_max_age(path: str) -> int:
+    """
+    Get the Cache-Control max-age for a request path.
+
+    Args:
+        path: The request path
+
+    Returns:
+        Max-age in seconds
+    """
+    for prefix, max_age in MAX_AGE_BY_PREFIX.items():
+        if path.startswith(prefix):
+            return max_age
+    return DEFAULT_MAX_AGE
+
+
+def get_available_encodings() -> list:
+    """Content encodings this server can produce, best first."""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def choose_encoding(request: Request) -> str | None:
+    """Pick the best content encoding the client accepts."""
+    accepted = request.accept_encodings
+    for encoding in get_available_encodings():
+        if accepted[encoding]:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a body with "br" or "gzip"."""
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def apply_response_layer(request: Request, response: Response) -> Response:
+    """
+    Add conditional caching headers and compression to an API response.
+    Responses that already set their own Cache-Control (e.g. the background
+    image) and non-200 responses are left untouched.
+
+    Args:
+        request: The current request
+        response: The response produced by the view
+
+    Returns:
+        The (possibly replaced) response
+    """
+    if not is_api_path(request.path) or response.status_code != 200:
+        return response
+    if response.direct_passthrough or "Cache-Control" in response.headers:
+        return response
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+
+    body = response.get_data()
+    response.set_etag(hashlib.sha1(body).hexdigest(), weak=True)
+    response.cache_control.max_age = get_max_age(request.path)
+    response.vary.add("Accept-Encoding")
+    # Payloads depend on the frame profile, selected by cookie or auth_key header
+    response.vary.add("Cookie")
+    response.vary.add("auth_key")
+
+    response.make_conditional(request)
+    if response.status_code == 304:
+        return response
+
+    encoding = choose_encoding(request)
+    if encoding and len(body) >= settings.compression_min_bytes:
+        response.set_data(compress(body, encoding))
+        response.headers["Content-Encoding"] = encoding
+
+    return response
@@ -0,0 +1,280 @@
+"""
+Warm-start snapshots of widget data.
+Keeps the last good payload of every widget in memory, writes it (together
+with the crypto cache) to disk atomically and periodically, and loads it
+again at startup. After a reboot the first request is answered from the
+snapshot while the real refresh runs in the background.
+"""
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from threading import Lock
+from typing import Any, Callable, Dict, Optional, Tuple
+from app.config.config import settings
+from app.modules import crypto_cache, locks, memory
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+# Snapshot storage: {name: {"data": ..., "timestamp": ..., "warm": bool, "size": estimated bytes}}
+# "warm" marks entries loaded from disk that have not been refreshed yet.
+_snapshots: Dict[str, Dict[str, Any]] = {}
+_refreshing: set = set()
+# One lock per snapshot name so concurrent requests share a single fetch
+_fetch_locks = locks.KeyedLocks()
+_snapshot_lock = Lock()
+_writer_started = False
+
+
+def get_snapshot(name: str) -> Optional[Any]:
+    """
+    Get the last stored payload for a widget.
+
+    Args:
+        name: Snapshot name, e.g. "weather:52.30,13.25"
+
+    Returns:
+        The payload if a snapshot exists, None otherwise
+    """
+    with _snapshot_lock:
+        if name in _snapshots:
+            return _snapshots[name]["data"]
+    return None
+
+
+def peek_snapshot(name: str, max_age: Optional[float] = None) -> Optional[Tuple[Any, bool]]:
+    """
+    Get the last stored payload for a widget without ever fetching.
+
+    Args:
+        name: Snapshot name
+        max_age: Optional number of seconds a snapshot counts as fresh
+
+    Returns:
+        Tuple of (payload, is_fresh), or None if there is no snapshot.
+        Warm snapshots loaded from disk are never fresh.
+    """
+    with _snapshot_lock:
+        entry = _snapshots.get(name)
+    if entry is None:
+        return None
+    return entry["data"], not entry["warm"] and _is_fresh(entry, max_age)
+
+
+def set_snapshot(name: str, data: Any) -> None:
+    """Store a fresh payload for a widget."""
+    size = memory.estimate_size(data)
+    with _snapshot_lock:
+        _snapshots[name] = {"data": data, "timestamp": time.time(), "warm": False, "size": size}
+    memory.enforce_budget()
+
+
+def _is_fresh(entry: Optional[Dict[str, Any]], max_age: Optional[float]) -> bool:
+    return (
+        entry is not None and max_age is not None
+        and time.time() - entry["timestamp"] < max_age
+    )
+
+
+def _refresh_in_background(name: str, fetch_func: Callable[[], Any]) -> None:
+    with _snapshot_lock:
+        if name in _refreshing:
+            return
+        _refreshing.add(name)
+
+    def run():
+        try:
+            set_snapshot(name, fetch_func())
+        except Exception as e:
+            logger.warning("Background refresh of %s failed: %s", name, e)
+        finally:
+            with _snapshot_lock:
+                _refreshing.discard(name)
+
+    threading.Thread(target=run, name=f"refresh-{name}", daemon=True).start()
+
+
+def serve_with_snapshot(name: str, fetch_func: Callable[[], Any], max_age: Optional[float] = None) -> Any:
+    """
+    Return widget data, using the snapshot where possible.
+
+    - A warm snapshot (loaded from disk) is returned immediately and refreshed
+      in the background.
+    - A snapshot younger than max_age is returned without fetching.
+    - Otherwise fetch_func is called and its result stored; if it fails, the
+      last snapshot is returned instead. Concurrent callers for the same name
+      wait for a single fetch.
+
+    Args:
+        name: Snapshot name
+        fetch_func: Function returning fresh (JSON-serializable) data
+        max_age: Optional number of seconds a snapshot counts as fresh
+
+    Returns:
+        Fresh or snapshot data
+
+    Raises:
+        Exception: If the fetch fails and no snapshot is available
+    """
+    with _snapshot_lock:
+        entry = _snapshots.get(name)
+
+    if entry is not None:
+        if entry["warm"]:
+            _refresh_in_background(name, fetch_func)
+            return entry["data"]
+        if _is_fresh(entry, max_age):
+            return entry["data"]
+
+    with _fetch_locks.hold(name):
+        # Another request may have refreshed it while we were waiting
+        with _snapshot_lock:
+            entry = _snapshots.get(name)
+        if _is_fresh(entry, max_age):
+            return entry["data"]
+
+        try:
+            data = fetch_func()
+        except Exception:
+            if entry is not None:
+                return entry["data"]
+            raise
+        set_snapshot(name, data)
+        return data
+
+
+def save_snapshots(path: Optional[str] = None) -> None:
+    """
+    Write all snapshots and the crypto cache to disk atomically.
+
+    Args:
+        path: Target file (default: settings.snapshot_path)
+    """
+    path = path or settings.snapshot_path
+    if not path:
+        return
+
+    with _snapshot_lock:
+        widgets = {
+            name: {"data": entry["data"], "timestamp": entry["timestamp"]}
+            for name, entry in _snapshots.items()
+        }
+    payload = {
+        "version": SNAPSHOT_VERSION,
+        "saved_at": time.time(),
+        "widgets": widgets,
+        "crypto_cache": crypto_cache.export_entries(),
+    }
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".snapshot-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_snapshots(path: Optional[str] = None) -> int:
+    """
+    Load snapshots from disk and mark them warm.
+
+    Args:
+        path: Source file (default: settings.snapshot_path)
+
+    Returns:
+        Number of widget snapshots loaded
+    """
+    path = path or settings.snapshot_path
+    if not path or not os.path.exists(path):
+        return 0
+
+    try:
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable snapshot file %s: %s", path, e)
+        return 0
+    if payload.get("version") != SNAPSHOT_VERSION:
+        return 0
+
+    widgets = payload.get("widgets", {})
+    with _snapshot_lock:
+        for name, entry in widgets.items():
+            if name not in _snapshots:
+                _snapshots[name] = {
+                    "data": entry["data"],
+                    "timestamp": entry["timestamp"],
+                    "warm": True,
+                    "size": memory.estimate_size(entry["data"]),
+                }
+    crypto_cache.restore_entries(payload.get("crypto_cache", {}))
+    memory.enforce_budget()
+    return len(widgets)
+
+
+def get_snapshot_stats() -> Dict[str, int]:
+    """Report the number of snapshots and their estimated size in bytes."""
+    with _snapshot_lock:
+        return {
+            "entries": len(_snapshots),
+            "bytes": sum(entry["size"] for entry in _snapshots.values()),
+        }
+
+
+def evict_snapshots(bytes_to_free: int) -> int:
+    """
+    Drop the oldest snapshots until the requested number of bytes is freed.
+
+    Args:
+        bytes_to_free: Number of bytes the memory governor wants back
+
+    Returns:
+        Number of bytes freed
+    """
+    freed = 0
+    with _snapshot_lock:
+        for name, entry in sorted(_snapshots.items(), key=lambda pair: pair[1]["timestamp"]):
+            if freed >= bytes_to_free:
+                break
+            del _snapshots[name]
+            freed += entry["size"]
+    return freed
+
+
+memory.register_cache("snapshots", memory.PRIORITY_FALLBACK, get_snapshot_stats, evict_snapshots)
+
+
+def _writer_loop(interval: float) -> None:
+    while True:
+        time.sleep(interval)
+        try:
+            save_snapshots()
+        except Exception as e:
+            logger.warning("Saving snapshots failed: %s", e)
+
+
+def init_snapshots() -> None:
+    """Load snapshots from disk and start the periodic writer thread."""
+    global _writer_started
+    if not settings.snapshot_path or _writer_started:
+        return
+    loaded = load_snapshots()
+    logger.info("Loaded %d widget snapshots from %s", loaded, settings.snapshot_path)
+    threading.Thread(
+        target=_writer_loop, args=(settings.snapshot_interval_seconds,),
+        name="snapshot-writer", daemon=True,
+    ).start()
+    atexit.register(save_snapshots)
+    _writer_started = True
@@ -0,0 +1,161 @@
+"""
+Server-rendered price sparklines.
+Draws a price series into a small SVG at the size the frame asks for, so the
+page only has to swap an <img> when the crypto card rotates instead of
+building a Chart.js chart each time. Rendered SVGs are kept until the series
+they were drawn from is replaced.
+"""
+from threading import Lock
+from typing import Dict, List, Optional, Sequence, Tuple
+from app.modules import memory
+
+DEFAULT_WIDTH = 300
+DEFAULT_HEIGHT = 120
+MIN_SIZE = 16
+MAX_SIZE = 1200
+# Same vertical padding as the Chart.js chart
+PADDING_Y = 8
+
+FALLBACK_COLORS = {"border": "rgba(255, 140, 0, 0.8)", "background": "rgba(247, 147, 26, 0.1)"}
+CURRENCY_SYMBOLS = {"usd": "$", "eur": "€", "gbp": "£", "jpy": "¥"}
+
+# Rendered SVGs: {(series_key, width, height): {"version": ..., "svg": bytes, "size": bytes}}
+_svg_cache: Dict[Tuple[str, int, int], Dict] = {}
+_svg_lock = Lock()
+
+
+def clamp_size(value: Optional[int], default: int) -> int:
+    """Limit a requested width or height to MIN_SIZE..MAX_SIZE pixels."""
+    if value is None:
+        return default
+    return max(MIN_SIZE, min(MAX_SIZE, value))
+
+
+def _format_price(value: float, vs_currency: str) -> str:
+    symbol = CURRENCY_SYMBOLS.get(vs_currency.lower())
+    amount = f"{round(value):,}" if abs(value) >= 10 else f"{value:.4g}"
+    return f"{symbol}{amount}" if symbol else f"{amount} {vs_currency.upper()}"
+
+
+def build_path(values: Sequence[float], width: int, height: int) -> str:
+    """
+    Scale a series into SVG path data filling the given box.
+
+    Args:
+        values: Prices, oldest first
+        width: Width of the box in pixels
+        height: Height of the box in pixels
+
+    Returns:
+        Path data ("M x,y L x,y ...") with coordinates rounded to 0.1 px
+    """
+    low, high = min(values), max(values)
+    span = (high - low) or 1.0
+    step = width / (len(values) - 1) if len(values) > 1 else 0.0
+    inner_height = max(height - 2 * PADDING_Y, 1)
+    points = [
+        f"{index * step:.1f},{PADDING_Y + (high - value) / span * inner_height:.1f}"
+        for index, value in enumerate(values)
+    ]
+    return "M" + " L".join(points)
+
+
+def render_sparkline(prices: List[list], width: int, height: int,
+                     colors: Optional[Dict[str, str]] = None, vs_currency: str = "usd") -> bytes:
+    """
+    Render a CoinGecko price series as an SVG sparkline with its min and max labelled.
+
+    Args:
+        prices: List of [timestamp_ms, price] pairs, oldest first
+        width: Width of the image in pixels
+        height: Height of the image in pixels
+        colors: {"border": ..., "background": ...} of the coin
+        vs_currency: Currency of the prices, used for the labels
+
+    Returns:
+        The SVG document as UTF-8 bytes
+    """
+    colors = colors or FALLBACK_COLORS
+    values = [float(price[1]) for price in prices]
+    line = build_path(values, width, height)
+    area = f"{line} L{width},{height} L0,{height} Z"
+    low, high = min(values), max(values)
+
+    svg = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}">'
+        f'<line x1="0" y1="{PADDING_Y}" x2="{width}" y2="{PADDING_Y}" stroke="rgba(255,255,255,0.1)"/>'
+        f'<line x1="0" y1="{height - PADDING_Y}" x2="{width}" y2="{height - PADDING_Y}" '
+        f'stroke="rgba(255,255,255,0.1)"/>'
+        f'<path d="{area}" fill="{colors["background"]}" stroke="none"/>'
+        f'<path d="{line}" fill="none" stroke="{colors["border"]}" stroke-width="2" '
+        f'stroke-linejoin="round" stroke-linecap="round"/>'
+        f'<g fill="#ffffff" font-family="sans-serif" font-size="11" font-weight="bold">'
+        f'<text x="2" y="{PADDING_Y + 12}">{_format_price(high, vs_currency)}</text>'
+        f'<text x="2" y="{height - PADDING_Y - 3}">{_format_price(low, vs_currency)}</text>'
+        f'</g></svg>'
+    )
+    return svg.encode("utf-8")
+
+
+def get_sparkline(series_key: str, version: float, prices: List[list], width: int, height: int,
+                  colors: Optional[Dict[str, str]] = None, vs_currency: str = "usd") -> bytes:
+    """
+    Get the SVG of a series at a size, rendering it only if the series
+    changed since it was last rendered at that size.
+
+    Args:
+        series_key: Cache key of the series (e.g. the crypto cache key)
+        version: Changes whenever the series is replaced (e.g. its fetch timestamp)
+        prices: List of [timestamp_ms, price] pairs, oldest first
+        width: Width of the image in pixels
+        height: Height of the image in pixels
+        colors: {"border": ..., "background": ...} of the coin
+        vs_currency: Currency of the prices, used for the labels
+
+    Returns:
+        The SVG document as UTF-8 bytes
+    """
+    key = (series_key, width, height)
+    with _svg_lock:
+        entry = _svg_cache.get(key)
+        if entry is not None and entry["version"] == version:
+            return entry["svg"]
+
+    svg = render_sparkline(prices, width, height, colors, vs_currency)
+    with _svg_lock:
+        _svg_cache[key] = {"version": version, "svg": svg, "size": len(svg)}
+    memory.enforce_budget()
+    return svg
+
+
+def get_sparkline_stats() -> Dict[str, int]:
+    """Report the size of the SVG cache for the memory governor."""
+    with _svg_lock:
+        return {
+            "entries": len(_svg_cache),
+            "bytes": sum(entry["size"] for entry in _svg_cache.values()),
+        }
+
+
+def evict_sparklines(bytes_to_free: int) -> int:
+    """
+    Drop rendered SVGs, oldest series first; they are re-rendered on demand.
+
+    Args:
+        bytes_to_free: Number of bytes the memory governor wants back
+
+    Returns:
+        Number of bytes freed
+    """
+    freed = 0
+    with _svg_lock:
+        for key, entry in sorted(_svg_cache.items(), key=lambda pair: pair[1]["version"]):
+            if freed >= bytes_to_free:
+                break
+            del _svg_cache[key]
+            freed += entry["size"]
+    return freed
+
+
+memory.register_cache("sparklines", memory.PRIORITY_REFETCHABLE, get_sparkline_stats, evict_sparklines)
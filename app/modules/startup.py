@@ -0,0 +1,135 @@
+"""
+Cold-start bookkeeping.
+Heavy third-party libraries (requests, nc_py_api) are imported on first
+use through `lazy_import`, or preloaded in a background thread once the first
+request shows the server is listening. Import times and the latency of the
+first request per route are recorded so boots can be compared.
+"""
+import importlib
+import logging
+import sys
+import threading
+import time
+from threading import Lock
+from types import ModuleType
+from typing import Any, Dict, Optional
+from app.config.config import settings
+from app.modules import timing
+
+logger = logging.getLogger(__name__)
+
+# Libraries only needed by single widgets, in the order they are preloaded
+HEAVY_MODULES = ("requests", "nc_py_api")
+
+# {module_name: seconds spent importing it}
+_import_times: Dict[str, float] = {}
+# {route: {"seconds": latency of its first request, "after_boot": seconds since boot}}
+_first_requests: Dict[str, Dict[str, float]] = {}
+_boot_start = time.perf_counter()
+_app_ready_seconds: Optional[float] = None
+_preload_started = False
+_startup_lock = Lock()
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Import a module on first use and record how long the import took.
+    Safe to call from several threads; a module being imported by another
+    thread (e.g. the preloader) is waited for instead of imported twice.
+
+    Args:
+        name: Module name, e.g. "nc_py_api"
+
+    Returns:
+        The imported module
+    """
+    if name in sys.modules:
+        # import_module also blocks while another thread is still importing it
+        return importlib.import_module(name)
+
+    start = time.perf_counter()
+    with timing.phase("import"):
+        module = importlib.import_module(name)
+    with _startup_lock:
+        _import_times.setdefault(name, time.perf_counter() - start)
+    return module
+
+
+def mark_app_ready(boot_start: float) -> None:
+    """
+    Record how long it took until the app was imported and configured.
+
+    Args:
+        boot_start: time.perf_counter() taken before the app's first import
+    """
+    global _boot_start, _app_ready_seconds
+    _boot_start = boot_start
+    _app_ready_seconds = time.perf_counter() - boot_start
+    logger.info("App ready after %.0f ms", _app_ready_seconds * 1000)
+
+
+def record_request(route: str, seconds: float) -> None:
+    """
+    Remember the latency of the first request of a route.
+
+    Args:
+        route: The matched URL rule
+        seconds: Request duration
+    """
+    if route in _first_requests:
+        return
+    with _startup_lock:
+        _first_requests.setdefault(route, {
+            "seconds": seconds,
+            "after_boot": time.perf_counter() - _boot_start,
+        })
+
+
+def _preload() -> None:
+    start = time.perf_counter()
+    for name in HEAVY_MODULES:
+        try:
+            lazy_import(name)
+        except Exception as e:
+            logger.warning("Preloading %s failed: %s", name, e)
+    logger.info("Preloaded %s in %.0f ms", ", ".join(HEAVY_MODULES), (time.perf_counter() - start) * 1000)
+
+
+def start_preload() -> None:
+    """
+    Import the heavy modules in a background thread.
+    Called on the first request, i.e. once the server is accepting connections.
+    """
+    global _preload_started
+    if _preload_started or not settings.preload_heavy_modules:
+        return
+    with _startup_lock:
+        if _preload_started:
+            return
+        _preload_started = True
+    threading.Thread(target=_preload, name="module-preload", daemon=True).start()
+
+
+def get_startup_report() -> Dict[str, Any]:
+    """
+    Get import and first-request timings of the current process.
+
+    Returns:
+        Dictionary with app ready time, per-module import times (ms) and
+        per-route first-request latencies (ms)
+    """
+    with _startup_lock:
+        imports = dict(_import_times)
+        first_requests = {route: dict(entry) for route, entry in _first_requests.items()}
+    return {
+        "app_ready_ms": round(_app_ready_seconds * 1000, 1) if _app_ready_seconds is not None else None,
+        "imports_ms": {name: round(seconds * 1000, 1) for name, seconds in imports.items()},
+        "first_requests_ms": {
+            route: {
+                "latency": round(entry["seconds"] * 1000, 1),
+                "after_boot": round(entry["after_boot"] * 1000, 1),
+            }
+            for route, entry in sorted(first_requests.items())
+        },
+        "preload_started": _preload_started,
+    }
@@ -0,0 +1,87 @@
+"""
+Per-request timing of named phases (upstream fetch, parse, serialize),
+exposed through the Server-Timing header, plus an on-demand cProfile hook.
+"""
+import cProfile
+import io
+import pstats
+from contextlib import contextmanager
+from flask import g, has_request_context
+from flask.json.provider import DefaultJSONProvider
+from app.modules import metrics
+
+PROFILE_TOP_FUNCTIONS = 30
+
+
+@contextmanager
+def phase(name: str):
+    """
+    Time the enclosed block and add it to the current request's phases.
+    Outside of a request context this is a no-op.
+
+    Args:
+        name: Phase name as it appears in Server-Timing (e.g. "parse")
+    """
+    if not has_request_context():
+        yield
+        return
+
+    start = metrics.now()
+    try:
+        yield
+    finally:
+        elapsed = metrics.now() - start
+        phases = g.setdefault("timing_phases", {})
+        phases[name] = phases.get(name, 0.0) + elapsed
+
+
+def get_server_timing_header(total_seconds: float | None = None) -> str:
+    """
+    Build the Server-Timing header value for the current request.
+
+    Args:
+        total_seconds: Optional total request duration to append as "total"
+
+    Returns:
+        Header value, e.g. 'upstream;dur=120.4, parse;dur=8.1, total;dur=130.2'
+    """
+    parts = [
+        f"{name};dur={seconds * 1000:.1f}"
+        for name, seconds in g.get("timing_phases", {}).items()
+    ]
+    if total_seconds is not None:
+        parts.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """JSON provider that records serialization time as the "serialize" phase."""
+
+    def dumps(self, obj, **kwargs) -> str:
+        with phase("serialize"):
+            return super().dumps(obj, **kwargs)
+
+
+def start_profiler() -> None:
+    """Start profiling the current request with cProfile."""
+    profiler = cProfile.Profile()
+    g.profiler = profiler
+    profiler.enable()
+
+
+def stop_profiler() -> str | None:
+    """
+    Stop the profiler of the current request, if any.
+
+    Returns:
+        The top functions by cumulative time as text, or None if not profiling
+    """
+    profiler = g.pop("profiler", None)
+    if profiler is None:
+        return None
+    profiler.disable()
+
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+    return out.getvalue()
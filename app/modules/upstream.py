@@ -0,0 +1,246 @@
+"""
+Instrumented access to upstream services.
+Every outgoing call goes through here so its latency, errors and 429s
+are recorded per upstream. Calls are also guarded by a circuit breaker per
+host and bounded by the deadline of the request that makes them.
+"""
+from contextlib import contextmanager
+from typing import IO, TYPE_CHECKING, Optional
+from urllib.parse import urlsplit
+from flask import g, has_request_context
+from app.modules import circuit_breaker, memory, metrics, startup, timing
+from app.modules.circuit_breaker import CircuitOpenError
+
+if TYPE_CHECKING:
+    import requests
+
+# Calls are not started with less time than this left on the deadline
+MIN_CALL_SECONDS = 0.05
+
+
+class DeadlineExceeded(Exception):
+    """Raised instead of starting an upstream call after the request's deadline."""
+
+
+# Everything a failed or skipped upstream call raises (requests' RequestException is an OSError)
+UPSTREAM_ERRORS = (OSError, CircuitOpenError, DeadlineExceeded)
+
+
+def _status_code(exception: Exception) -> Optional[int]:
+    response = getattr(exception, "response", None)
+    status = getattr(response, "status_code", None)
+    if status is None:
+        # nc_py_api raises NextcloudException with the status on the exception
+        status = getattr(exception, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def _is_rate_limited_response(exception: Exception) -> bool:
+    return _status_code(exception) == 429
+
+
+def _is_host_failure(exception: Exception) -> bool:
+    """Connection errors, timeouts, 5xx and 429 count against a host; other 4xx don't."""
+    status = _status_code(exception)
+    return status is None or status == 429 or status >= 500
+
+
+def start_deadline(seconds: float) -> None:
+    """
+    Set the deadline of the current request.
+    All upstream calls the request makes share this budget.
+
+    Args:
+        seconds: Time budget from now
+    """
+    g.upstream_deadline = metrics.now() + seconds
+
+
+def get_remaining_time() -> Optional[float]:
+    """
+    Get the time left before the current request's deadline.
+
+    Returns:
+        Seconds left, or None outside a request or without a deadline
+    """
+    if not has_request_context() or "upstream_deadline" not in g:
+        return None
+    deadline = g.upstream_deadline
+    if g.get("upstream_slice_deadline") is not None:
+        deadline = min(deadline, g.upstream_slice_deadline)
+    return deadline - metrics.now()
+
+
+@contextmanager
+def deadline_slice(parts: int):
+    """
+    Limit upstream calls made inside the block to an equal share of the
+    time left, for handlers that make several calls one after another.
+    Time a share doesn't use is left to the following ones.
+
+    Args:
+        parts: Number of shares the remaining time is split into, including this one
+    """
+    remaining = get_remaining_time()
+    if remaining is None or parts <= 1:
+        yield
+        return
+
+    previous = g.get("upstream_slice_deadline")
+    g.upstream_slice_deadline = metrics.now() + remaining / parts
+    try:
+        yield
+    finally:
+        g.upstream_slice_deadline = previous
+
+
+def get_call_timeout(timeout: Optional[float] = None) -> Optional[float]:
+    """
+    Shorten an upstream call's timeout to what is left of the request's deadline.
+
+    Args:
+        timeout: The call's own timeout in seconds (None for no limit)
+
+    Returns:
+        The effective timeout
+
+    Raises:
+        DeadlineExceeded: If too little time is left to start the call
+    """
+    remaining = get_remaining_time()
+    if remaining is None:
+        return timeout
+    if remaining < MIN_CALL_SECONDS:
+        raise DeadlineExceeded(f"Request deadline exceeded ({remaining * 1000:.0f} ms left)")
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+def _check_deadline(upstream: str, timeout: Optional[float] = None) -> Optional[float]:
+    try:
+        return get_call_timeout(timeout)
+    except DeadlineExceeded:
+        metrics.upstream_skipped.inc(upstream, "deadline")
+        raise
+
+
+@contextmanager
+def track(upstream: str, host: Optional[str] = None):
+    """
+    Record latency and failures of an upstream call made inside the block.
+    Used directly for clients that don't go through `get`, e.g. nc_py_api.
+
+    Args:
+        upstream: Name of the upstream service (e.g. "openweather")
+        host: Host the call goes to, selects the circuit breaker (default: upstream)
+
+    Raises:
+        DeadlineExceeded: If the request's deadline has passed
+        CircuitOpenError: If the host's circuit breaker is open
+    """
+    _check_deadline(upstream)
+    breaker = circuit_breaker.get_breaker(host or upstream)
+    if not breaker.allow():
+        metrics.upstream_skipped.inc(upstream, "circuit_open")
+        raise CircuitOpenError(f"{breaker.name} is failing, not calling it for now")
+
+    start = metrics.now()
+    try:
+        with timing.phase("upstream"):
+            yield
+    except Exception as e:
+        metrics.upstream_errors.inc(upstream)
+        if _is_rate_limited_response(e):
+            metrics.upstream_rate_limited.inc(upstream)
+        if _is_host_failure(e):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        raise
+    else:
+        breaker.record_success()
+    finally:
+        metrics.upstream_latency.observe(metrics.now() - start, upstream)
+
+
+def get(upstream: str, url: str, **kwargs) -> "requests.Response":
+    """
+    Perform a GET request against an upstream service and raise for HTTP errors.
+    The timeout is capped by the time left on the request's deadline.
+
+    Args:
+        upstream: Name of the upstream service (e.g. "openweather")
+        url: The URL to request
+        **kwargs: Passed through to requests.get
+
+    Returns:
+        The successful response
+    """
+    requests = startup.lazy_import("requests")
+    kwargs["timeout"] = _check_deadline(upstream, kwargs.get("timeout"))
+    with track(upstream, urlsplit(url).hostname):
+        resp = requests.get(url, **kwargs)
+        resp.raise_for_status()
+        return resp
+
+
+def download(upstream: str, url: str, **kwargs) -> IO[bytes]:
+    """
+    Stream a GET response body into a spool file instead of holding it in
+    memory. Bodies above the spill threshold end up on disk.
+
+    Args:
+        upstream: Name of the upstream service (e.g. "calendar")
+        url: The URL to request
+        **kwargs: Passed through to requests.get
+
+    Returns:
+        The body as a binary file, rewound for reading; the caller closes it
+    """
+    requests = startup.lazy_import("requests")
+    kwargs["timeout"] = _check_deadline(upstream, kwargs.get("timeout"))
+    with track(upstream, urlsplit(url).hostname):
+        resp = requests.get(url, stream=True, **kwargs)
+        try:
+            resp.raise_for_status()
+            return memory.spool_chunks(resp.iter_content(memory.CHUNK_SIZE))
+        finally:
+            resp.close()
+
+
+@contextmanager
+def stream(upstream: str, url: str, **kwargs):
+    """
+    Perform a streamed GET request, for callers that read only part of the
+    body. The call counts as in progress (latency, failures) until the block
+    exits, and the connection is closed then even if the body wasn't read.
+
+    Args:
+        upstream: Name of the upstream service (e.g. "merriam-webster")
+        url: The URL to request
+        **kwargs: Passed through to requests.get
+
+    Yields:
+        The response; its body can be read from `resp.raw`. A 304 answer to
+        a conditional request is yielded as is.
+    """
+    requests = startup.lazy_import("requests")
+    urllib3 = startup.lazy_import("urllib3")
+    # Errors reading the body from the socket; anything else raised in the
+    # caller's block (e.g. a parse error) says nothing about the host
+    transport_errors = (OSError, urllib3.exceptions.HTTPError)
+    kwargs["timeout"] = _check_deadline(upstream, kwargs.get("timeout"))
+    caller_error = None
+    with track(upstream, urlsplit(url).hostname):
+        resp = requests.get(url, stream=True, **kwargs)
+        try:
+            resp.raise_for_status()
+            try:
+                yield resp
+            except transport_errors:
+                raise
+            except Exception as e:
+                caller_error = e
+        finally:
+            resp.close()
+    if caller_error is not None:
+        raise caller_error
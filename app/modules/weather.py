@@ -1,45 +1,45 @@
 from app.config.config import settings
-import requests
+from app.config.profiles import City
+from app.modules import snapshot, timing, upstream
 from flask import jsonify
 from datetime import datetime
+from typing import Optional, Tuple
 
 
-#First City - Ludwigsfelde ------------------------------------------------------------
-def get_weather_first_city():
-    if settings.openweather_api_key:
-        try:
-            resp = requests.get(
-                "https://api.openweathermap.org/data/2.5/weather",
-                params={
-                    "lat": settings.first_city_weather_latitude,
-                    "lon": settings.first_city_weather_longitude,
-                    "appid": settings.openweather_api_key,
-                    "units": settings.units,
-                    "lang": "en",
-                },
-                timeout=5,
-            )
-            resp.raise_for_status()
-            data = resp.json()
-            return jsonify({
-                "source": "openweathermap",
-                "units": settings.units,
-                "city": data.get("name") or "Ludwigsfelde",
-                "temp": data.get("main", {}).get("temp"),
-                "feels_like": data.get("main", {}).get("feels_like"),
-                "icon": (data.get("weather") or [{}])[0].get("icon"),
-                "sunrise": data.get("sys", {}).get("sunrise"),
-                "sunset": data.get("sys", {}).get("sunset"),
-                "wind_speed": data.get("wind", {}).get("speed"),
-                "rain_precipitation": data.get("rain", {}).get("1h"),
-            })
-        except Exception:
-            pass
-
-    return jsonify({
+def _fetch_current_weather(latitude: str, longitude: str, default_city: str) -> dict:
+    resp = upstream.get(
+        "openweather",
+        f"{settings.openweather_base_url}/data/2.5/weather",
+        params={
+            "lat": latitude,
+            "lon": longitude,
+            "appid": settings.openweather_api_key,
+            "units": settings.units,
+            "lang": "en",
+        },
+        timeout=5,
+    )
+    with timing.phase("parse"):
+        data = resp.json()
+    return {
+        "source": "openweathermap",
+        "units": settings.units,
+        "city": data.get("name") or default_city,
+        "temp": data.get("main", {}).get("temp"),
+        "feels_like": data.get("main", {}).get("feels_like"),
+        "icon": (data.get("weather") or [{}])[0].get("icon"),
+        "sunrise": data.get("sys", {}).get("sunrise"),
+        "sunset": data.get("sys", {}).get("sunset"),
+        "wind_speed": data.get("wind", {}).get("speed"),
+        "rain_precipitation": data.get("rain", {}).get("1h"),
+    }
+
+
+def _static_weather(city: str) -> dict:
+    return {
         "source": "static",
         "units": settings.units,
-        "city": "Ludwigsfelde",
+        "city": city,
         "temp": 18.0,
         "temp_min": 16.0,
         "temp_max": 20.0,
@@ -48,132 +48,60 @@ def get_weather_first_city():
         "icon": "01d",
         "wind_speed": 5.0,
         "rain_precipitation": None,
-    })
+    }
 
-def get_weather_forecast_first_city():
-    if not settings.openweather_api_key:
-        raise ValueError("Missing OpenWeather API key in settings")
 
-    resp = requests.get(
-        "https://api.openweathermap.org/data/2.5/forecast",
-        params={
-            "lat": settings.first_city_weather_latitude,
-            "lon": settings.first_city_weather_longitude,
-            "units": settings.units,
-            "appid": settings.openweather_api_key,
-        },
-        timeout=5,
-    )
-    resp.raise_for_status()
-    data = resp.json()
+def _weather_snapshot_name(city: City) -> str:
+    return f"weather:{city.latitude},{city.longitude}"
 
-    forecasts = data.get("list", [])
-    if not forecasts:
-        raise ValueError("No forecast data returned")
 
-    days = {}
-    for entry in forecasts:
-        dt = datetime.utcfromtimestamp(entry["dt"])
-        day = dt.date()
-        if day == datetime.utcnow().date():  # Skip today
-            continue
-        temp = entry["main"]["temp"]
-        desc = entry["weather"][0]["description"]
-        icon = entry["weather"][0]["icon"]
+def _forecast_snapshot_name(city: City) -> str:
+    return f"forecast:{city.latitude},{city.longitude}"
 
-        if day not in days:
-            days[day] = {
-                "temps": [],
-                "descriptions": [desc],
-                "icons": [icon],
-                "dt": entry["dt"],
-            }
-        days[day]["temps"].append(temp)
 
-    items = []
-    for i, (day, values) in enumerate(sorted(days.items())):
-        temps = values["temps"]
-        items.append({
-            "dt": values["dt"],
-            "date": day.isoformat(),
-            "temp": sum(temps) / len(temps),
-            "temp_min": min(temps),
-            "temp_max": max(temps),
-            "description": values["descriptions"][0],
-            "icon": values["icons"][0],
-        })
-        if i == 3:  # only next 4 days
-            break
+def peek_current_weather(city: City) -> Optional[Tuple[dict, bool]]:
+    """Return the stored current weather of a city as (payload, is_fresh), without fetching."""
+    return snapshot.peek_snapshot(_weather_snapshot_name(city), settings.weather_cache_seconds)
 
-    return jsonify({
-        "source": "openweathermap",
-        "units": settings.units,
-        "items": items,
-    })
+
+def peek_weather_forecast(city: City) -> Optional[Tuple[dict, bool]]:
+    """Return the stored forecast of a city as (payload, is_fresh), without fetching."""
+    return snapshot.peek_snapshot(_forecast_snapshot_name(city), settings.weather_cache_seconds)
 
 
-#Second City - Leipzig ----------------------------------------------------------------
-def get_weather_second_city():
+def get_current_weather(city: City):
+    """
+    Return current weather JSON for a city.
+    Cached per location, so frames sharing a city share one upstream call.
+    """
     if settings.openweather_api_key:
         try:
-            resp = requests.get(
-                "https://api.openweathermap.org/data/2.5/weather",
-                params={
-                    "lat": settings.second_city_weather_latitude,
-                    "lon": settings.second_city_weather_longitude,
-                    "appid": settings.openweather_api_key,
-                    "units": settings.units,
-                    "lang": "en",
-                },
-                timeout=5,
-            )
-            resp.raise_for_status()
-            data = resp.json()
-            return jsonify({
-                "source": "openweathermap",
-                "units": settings.units,
-                "city": data.get("name") or "Leipzig",
-                "temp": data.get("main", {}).get("temp"),
-                "feels_like": data.get("main", {}).get("feels_like"),
-                "icon": (data.get("weather") or [{}])[0].get("icon"),
-                "sunrise": data.get("sys", {}).get("sunrise"),
-                "sunset": data.get("sys", {}).get("sunset"),
-                "wind_speed": data.get("wind", {}).get("speed"),
-                "rain_precipitation": data.get("rain", {}).get("1h"),
-            })
+            return jsonify(snapshot.serve_with_snapshot(
+                _weather_snapshot_name(city),
+                lambda: _fetch_current_weather(city.latitude, city.longitude, city.name),
+                max_age=settings.weather_cache_seconds,
+            ))
         except Exception:
             pass
 
-    return jsonify({
-        "source": "static",
-        "units": settings.units,
-        "city": "Leipzig",
-        "temp": 18.0,
-        "temp_min": 16.0,
-        "temp_max": 20.0,
-        "feels_like": 18.5,
-        "description": "clear sky",
-        "icon": "01d",
-        "wind_speed": 5.0,
-        "rain_precipitation": None,
-    })
+    return jsonify(_static_weather(city.name))
 
-def get_weather_forecast_second_city():
-    if not settings.openweather_api_key:
-        raise ValueError("Missing OpenWeather API key in settings")
 
-    resp = requests.get(
-        "https://api.openweathermap.org/data/2.5/forecast",
+def _fetch_forecast(latitude: str, longitude: str) -> dict:
+    resp = upstream.get(
+        "openweather",
+        f"{settings.openweather_base_url}/data/2.5/forecast",
         params={
-            "lat": settings.second_city_weather_latitude,
-            "lon": settings.second_city_weather_longitude,
+            "lat": latitude,
+            "lon": longitude,
             "units": settings.units,
             "appid": settings.openweather_api_key,
         },
         timeout=5,
     )
-    resp.raise_for_status()
-    data = resp.json()
+
+    with timing.phase("parse"):
+        data = resp.json()
 
     forecasts = data.get("list", [])
     if not forecasts:
@@ -213,8 +141,36 @@ def get_weather_forecast_second_city():
         if i == 3:  # only next 4 days
             break
 
-    return jsonify({
+    return {
         "source": "openweathermap",
         "units": settings.units,
         "items": items,
-    })
\ No newline at end of file
+    }
+
+
+def get_weather_forecast(city: City):
+    """
+    Return the forecast for the next days for a city, cached per location.
+    If neither OpenWeather nor a snapshot can provide it, an empty forecast
+    with the error is returned instead of failing the request.
+    """
+    try:
+        if not settings.openweather_api_key:
+            raise ValueError("Missing OpenWeather API key in settings")
+
+        return jsonify(snapshot.serve_with_snapshot(
+            _forecast_snapshot_name(city),
+            lambda: _fetch_forecast(city.latitude, city.longitude),
+            max_age=settings.weather_cache_seconds,
+        ))
+    except Exception as e:
+        response = jsonify({
+            "source": "unavailable",
+            "units": settings.units,
+            "items": [],
+            "error": str(e),
+        })
+        # Let the next poll retry instead of caching the failure for the full interval
+        response.cache_control.max_age = 60
+        return response
+
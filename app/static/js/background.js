@@ -0,0 +1,60 @@
+// Background slideshow: the server schedules the photos, the page crossfades
+// between two layers once the next photo is in the browser cache
+
+const BACKGROUND_PLAYLIST_COUNT = 3;
+const BACKGROUND_RETRY_MS = 60 * 1000;
+
+async function fetchBackgroundPlaylist() {
+  const res = await fetch(`/api/background/playlist?count=${BACKGROUND_PLAYLIST_COUNT}`);
+  if (!res.ok) throw new Error('Background playlist request failed');
+  return res.json();
+}
+
+function preloadBackground(url) {
+  return new Promise((resolve, reject) => {
+    const img = new Image();
+    img.onload = () => resolve(url);
+    img.onerror = reject;
+    img.src = url;
+  });
+}
+
+function initBackground() {
+  const layers = [document.getElementById('background-a'), document.getElementById('background-b')];
+  if (!layers[0] || !layers[1]) return;
+  let active = 0;
+  let currentId = null;
+
+  async function show(item) {
+    if (item.id === currentId) return;
+    await preloadBackground(item.url);
+    const next = layers[1 - active];
+    next.style.backgroundImage = `url('${item.url}')`;
+    next.classList.add('visible');
+    layers[active].classList.remove('visible');
+    active = 1 - active;
+    currentId = item.id;
+  }
+
+  async function tick() {
+    let wait = BACKGROUND_RETRY_MS;
+    try {
+      const playlist = await fetchBackgroundPlaylist();
+      const now = Date.now() / 1000;
+      const items = playlist.items || [];
+      const due = items.filter(item => item.show_at <= now).pop() || items[0];
+      const upcoming = items.find(item => item.show_at > now);
+      if (due) await show(due);
+      if (upcoming) {
+        // Browsers ignore Link headers on fetch() responses, so warm the cache here too
+        preloadBackground(upcoming.url).catch(() => {});
+        wait = (upcoming.show_at - now) * 1000;
+      }
+    } catch (e) {
+      console.error('Background error:', e);
+    }
+    setTimeout(tick, Math.max(wait, 1000));
+  }
+
+  tick();
+}
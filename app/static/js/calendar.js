@@ -270,10 +270,53 @@ function renderCalendar(events) {
   }
 }
 
+// Events the page has, per calendar and by id, and the version of each calendar
+const calendarState = { versions: {}, calendars: {} };
+
+// Apply an /api/calendar payload: full "events" lists replace a calendar,
+// deltas (added/changed/removed) patch it
+function applyCalendarPayload(data, full) {
+  if (full) {
+    calendarState.calendars = {};
+    calendarState.versions = {};
+  }
+  for (const [calendarType, calendarData] of Object.entries(data?.calendars || {})) {
+    if (calendarData.error) {
+      console.warn(`Calendar ${calendarType} error:`, calendarData.error);
+    }
+    if (calendarData.version !== undefined) {
+      calendarState.versions[calendarType] = calendarData.version;
+    }
+    if (Array.isArray(calendarData.events)) {
+      calendarState.calendars[calendarType] =
+        Object.fromEntries(calendarData.events.map((ev) => [ev.id, ev]));
+      continue;
+    }
+    const events = calendarState.calendars[calendarType] || {};
+    (calendarData.removed || []).forEach((id) => { delete events[id]; });
+    [...(calendarData.added || []), ...(calendarData.changed || [])].forEach((ev) => { events[ev.id] = ev; });
+    calendarState.calendars[calendarType] = events;
+  }
+}
+
+// Flatten the calendar state into one list tagged with calendarType
+function collectCalendarEvents() {
+  const allEvents = [];
+  const calendarTypes = ['personal', 'holidays', 'garbage'];
+
+  for (const calendarType of calendarTypes) {
+    const events = Object.values(calendarState.calendars[calendarType] || {});
+    allEvents.push(...events.map((ev) => ({ ...ev, calendarType })));
+  }
+  return allEvents;
+}
+
 function initCalendar(Events) {
+  const initial = InitialData.get('/api/calendar');
+
   // Hide all calendar items initially while loading
   const container = document.getElementById('calendar-entries');
-  if (container) {
+  if (container && !initial) {
     const slots = container.querySelectorAll('.calendar-item');
     slots.forEach(slot => {
       slot.classList.add('calendar-item-empty');
@@ -285,7 +328,11 @@ function initCalendar(Events) {
     const timeout = setTimeout(() => controller.abort(), 10000); // 10 second timeout
     
     try {
-      const res = await fetch('/api/calendar', { signal: controller.signal });
+      const since = Object.entries(calendarState.versions)
+        .map(([calendarType, version]) => `${calendarType}:${version}`)
+        .join(',');
+      const url = since ? `/api/calendar?since=${encodeURIComponent(since)}` : '/api/calendar';
+      const res = await fetch(url, { signal: controller.signal });
       clearTimeout(timeout);
       
       if (!res.ok) {
@@ -293,24 +340,15 @@ function initCalendar(Events) {
         renderCalendar([]);
         return;
       }
+      if (res.status === 204) {
+        // Nothing changed; only let events that have started drop off
+        renderCalendar(collectCalendarEvents());
+        return;
+      }
       
       const data = await res.json();
-      const calendars = data?.calendars || {};
-      
-      // Extract events from each calendar and add calendarType
-      const allEvents = [];
-      const calendarTypes = ['personal', 'holidays', 'garbage'];
-      
-      for (const calendarType of calendarTypes) {
-        const calendarData = calendars[calendarType];
-        if (calendarData && Array.isArray(calendarData.events)) {
-          const events = calendarData.events.map((ev) => ({ ...ev, calendarType }));
-          allEvents.push(...events);
-          console.log(`Calendar ${calendarType} fetched:`, events.length, 'events');
-        } else if (calendarData?.error) {
-          console.warn(`Calendar ${calendarType} error:`, calendarData.error);
-        }
-      }
+      applyCalendarPayload(data, data.since === undefined);
+      const allEvents = collectCalendarEvents();
       
       console.log('Total events from all calendars:', allEvents.length);
       renderCalendar(allEvents);
@@ -327,8 +365,16 @@ function initCalendar(Events) {
     }
   }
 
-  // Initial paint and periodic refresh
-  update();
+  // Initial paint from the server-embedded data, then periodic refresh
+  if (initial) {
+    applyCalendarPayload(initial.data, true);
+    // A calendar without a snapshot was left out: refetch everything, not just changes
+    if (initial.data?.complete === false) calendarState.versions = {};
+    const allEvents = collectCalendarEvents();
+    renderCalendar(allEvents);
+    Events.emit('calendar:update', allEvents);
+  }
+  if (!initial?.fresh) update();
   setInterval(update, 1000 * 60 * 15); // Refresh every 15 minutes
 }
 
@@ -7,6 +7,22 @@ let currentChartCoinId = null;
 // Cache for historical data with timestamps
 let cachedChartData = {};
 const CHART_CACHE_DURATION_MS = 1000 * 60 * 10; // 10 minutes
+// Server-embedded history that is stale is still drawn, but refetched after a minute
+const STALE_CHART_RETRY_MS = 1000 * 60;
+
+function seedChartCache() {
+  const prefix = '/api/crypto-history/';
+  const now = Date.now();
+  InitialData.paths(prefix).forEach(path => {
+    const entry = InitialData.get(path);
+    cachedChartData[path.slice(prefix.length)] = {
+      data: entry.data,
+      timestamp: entry.fresh ? now : now - CHART_CACHE_DURATION_MS + STALE_CHART_RETRY_MS
+    };
+  });
+}
+
+seedChartCache();
 
 async function loadChart(coinId) {
   const canvas = document.getElementById("crypto-chart");
@@ -128,7 +144,33 @@ async function loadChart(coinId) {
   }
 }
 
+// Sparkline mode: the server renders the chart as SVG, rotating only swaps the image.
+// The URL changes every CHART_CACHE_DURATION_MS so the image follows new history data.
+function showSparkline(img, coinId) {
+  if (!coinId) return;
+  const rect = img.getBoundingClientRect();
+  const width = Math.round(rect.width) || 300;
+  const height = Math.round(rect.height) || 120;
+  const period = Math.floor(Date.now() / CHART_CACHE_DURATION_MS);
+  const src = `/api/crypto-sparkline/${encodeURIComponent(coinId)}.svg?w=${width}&h=${height}&p=${period}`;
+  if (img.getAttribute('src') !== src) img.src = src;
+}
+
+function initCryptoSparkline(Events, img) {
+  if (typeof COIN_IDS === 'undefined' || !Array.isArray(COIN_IDS) || COIN_IDS.length === 0)
+    return setTimeout(() => initCryptoSparkline(Events, img), 200);
+
+  img.addEventListener('load', () => { img.style.visibility = 'visible'; });
+  img.addEventListener('error', () => { img.style.visibility = 'hidden'; });
+  showSparkline(img, COIN_IDS[0]);
+
+  Events.on('crypto:rotate', coinId => showSparkline(img, coinId));
+  Events.on('crypto:update', () => showSparkline(img, COIN_IDS?.[currentCoinIndex]));
+}
+
 function initCryptoChart(Events) {
+  const sparkline = document.getElementById("crypto-sparkline");
+  if (sparkline) return initCryptoSparkline(Events, sparkline);
   if (typeof Chart === 'undefined')
     return setTimeout(() => initCryptoChart(Events), 100);
   const canvas = document.getElementById("crypto-chart");
@@ -116,17 +116,20 @@ function initCrypto(Events) {
   const card = document.querySelector('.card-crypto');
   if (!card) return;
 
-  async function loadConfig() {
-    // Fetch coin configuration (ids + icons) from backend
-    const res = await fetch('/api/crypto-config');
-    if (!res.ok) throw new Error('Crypto config request failed');
-    const cfg = await res.json();
+  function applyConfig(cfg) {
     COIN_IDS = Array.isArray(cfg.coin_ids) ? cfg.coin_ids : [];
     COIN_CONFIG = cfg.coin_config || {};
     // Expose colors for chart script
     if (typeof window !== 'undefined') {
       window.COIN_COLORS = cfg.coin_colors || {};
     }
+  }
+
+  async function loadConfig() {
+    // Fetch coin configuration (ids + icons) from backend
+    const res = await fetch('/api/crypto-config');
+    if (!res.ok) throw new Error('Crypto config request failed');
+    applyConfig(await res.json());
     if (COIN_IDS.length === 0) {
       throw new Error('No coin ids configured');
     }
@@ -165,6 +168,19 @@ function initCrypto(Events) {
     }
   }
 
+  // Paint from the server-embedded data; update() then only fetches what is stale
+  const initialConfig = InitialData.get('/api/crypto-config');
+  if (initialConfig) applyConfig(initialConfig.data);
+  const initialPrices = InitialData.get('/api/crypto-price');
+  if (initialPrices && initialPrices.data.data && COIN_IDS.length > 0) {
+    cryptoData = initialPrices.data.data;
+    renderCrypto(COIN_IDS[0]);
+    if (initialPrices.fresh) {
+      cachedPriceData = cryptoData;
+      cachedPriceTimestamp = Date.now();
+    }
+  }
+
   update();
   // Refresh data every 10 minutes to reduce API calls
   setInterval(update, 1000 * 60 * 10);
@@ -34,8 +34,10 @@ async function updateDailyWord() {
     return;
   }
 
-  const data = await fetchDailyWord();
-  
+  renderDailyWord(wordElement, definitionElement, await fetchDailyWord());
+}
+
+function renderDailyWord(wordElement, definitionElement, data) {
   if (data && data.word) {
     wordElement.textContent = data.word;
     if (definitionElement) {
@@ -53,11 +55,25 @@ async function updateDailyWord() {
   }
 }
 
+// Paint the server-embedded word, fetching only if it is missing or stale
+function initDailyWord() {
+  const initial = InitialData.get('/daily-word');
+  const wordElement = document.getElementById('daily-word');
+  if (initial && initial.data.daily_word && wordElement) {
+    renderDailyWord(wordElement, document.getElementById('daily-word-definition'), {
+      word: initial.data.daily_word,
+      definition: initial.data.definition || null
+    });
+    if (initial.fresh) return;
+  }
+  updateDailyWord();
+}
+
 // Initialize daily word when DOM is ready
 if (document.readyState === 'loading') {
-  document.addEventListener('DOMContentLoaded', updateDailyWord);
+  document.addEventListener('DOMContentLoaded', initDailyWord);
 } else {
-  updateDailyWord();
+  initDailyWord();
 }
 
 // Update daily word at midnight
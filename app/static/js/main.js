@@ -10,9 +10,22 @@ const Events = {
   }
 };
 
+// Widget payloads embedded into the page by the server, keyed by API path.
+// Each entry is { data, fresh }; fresh data doesn't need an immediate refetch.
+const InitialData = {
+  _entries: window.INITIAL_DATA || {},
+  get(path) {
+    return this._entries[path] || null;
+  },
+  paths(prefix) {
+    return Object.keys(this._entries).filter(path => path.startsWith(prefix));
+  }
+};
+
 function init() {
   initClock(Events);
   initWeather(Events);
+  if (typeof initBackground === 'function') initBackground(Events);
   if (typeof initCalendar === 'function') initCalendar(Events);
   if (typeof initCrypto === 'function') initCrypto(Events);
   if (typeof initCryptoChart === 'function') initCryptoChart(Events);
@@ -1,8 +1,15 @@
 // Weather fetch and render
 
+function weatherEndpoint(cityKey) {
+  return cityKey === 'second-city' ? '/api/weather/second-city' : '/api/weather/first-city';
+}
+
+function forecastEndpoint(cityKey) {
+  return cityKey === 'second-city' ? '/api/forecast/second-city' : '/api/forecast/first-city';
+}
+
 async function fetchWeather(cityKey) {
-  const endpoint = cityKey === 'second-city' ? '/api/weather/second-city' : '/api/weather/first-city';
-  const res = await fetch(endpoint);
+  const res = await fetch(weatherEndpoint(cityKey));
   if (!res.ok) throw new Error('Weather request failed');
   return res.json();
 }
@@ -68,8 +75,7 @@ function initWeather(Events) {
       }
 
       try {
-        const forecastEndpoint = cityKey === 'second-city' ? '/api/forecast/second-city' : '/api/forecast/first-city';
-        const forecastRes = await fetch(forecastEndpoint);
+        const forecastRes = await fetch(forecastEndpoint(cityKey));
         if (forecastRes.ok) {
           const forecast = await forecastRes.json();
           renderForecast(card, forecast);
@@ -80,7 +86,19 @@ function initWeather(Events) {
       }
     }
 
-    update();
+    // Paint from the server-embedded data first
+    const initialWeather = InitialData.get(weatherEndpoint(cityKey));
+    const initialForecast = InitialData.get(forecastEndpoint(cityKey));
+    if (initialWeather) {
+      renderWeather(card, initialWeather.data);
+      Events.emit(`weather:update:${cityKey}`, initialWeather.data);
+    }
+    if (initialForecast) {
+      renderForecast(card, initialForecast.data);
+      Events.emit(`weather:forecast:${cityKey}`, initialForecast.data);
+    }
+
+    if (!(initialWeather?.fresh && initialForecast?.fresh)) update();
     setInterval(update, 1000 * 60 * 15);
   });
 }
@@ -0,0 +1,330 @@
+"""
+Upstream call budget simulator.
+
+Replays a number of frames polling the server on the intervals hard-coded
+in the JS modules (weather/forecast/calendar every 15 min, crypto prices
+every 10 min, coin rotation every 5 s, daily word at midnight, background
+playlist at every slideshow slot) against a virtual clock. The real Flask app, crypto_cache and module code handle
+every request; only outgoing HTTP is stubbed. The report shows how many
+upstream calls each API receives per day.
+
+Usage:
+    python -m benchmarks.budget --frames 3 --hours 24
+"""
+import argparse
+import heapq
+import io
+import json
+import random
+from types import SimpleNamespace
+from unittest import mock
+from urllib.parse import urlparse
+
+import requests
+
+from app.config.config import settings
+from app.modules import crypto_cache, daily_word, nextcloud, snapshot
+from benchmarks import stubs
+
+# Intervals from app/static/js/*.js
+WEATHER_INTERVAL = 15 * 60
+CALENDAR_INTERVAL = 15 * 60
+CRYPTO_INTERVAL = 10 * 60
+CRYPTO_ROTATION_INTERVAL = 5
+CLIENT_PRICE_CACHE = 10 * 60
+CLIENT_CHART_CACHE = 10 * 60
+BACKGROUND_PLAYLIST_COUNT = 3
+BACKGROUND_RETRY_INTERVAL = 60
+DAY = 24 * 60 * 60
+
+SIM_HOSTS = {
+    "openweather.sim": "openweather",
+    "coingecko.sim": "coingecko",
+    "calendar.sim": "calendar",
+    "merriam-webster.sim": "merriam-webster",
+}
+
+# Free tier limits used for the quota columns of the report
+DEFAULT_QUOTAS = {
+    "coingecko": 10000 / 30,  # demo plan: 10k calls per month
+    "openweather": 1000,      # free plan: 1000 calls per day
+}
+
+
+class VirtualClock:
+    """Clock that only moves when the simulation advances it."""
+
+    def __init__(self, start: float):
+        self.now = start
+
+    def time(self) -> float:
+        return self.now
+
+
+class _SimResponse:
+    """Minimal stand-in for requests.Response."""
+
+    def __init__(self, status_code: int, content: bytes):
+        self.status_code = status_code
+        self.content = content
+        self.text = content.decode("utf-8", errors="replace")
+        self.headers = {}
+        self.raw = io.BytesIO(content)
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error", response=self)
+
+    def iter_content(self, chunk_size: int = 1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+
+class StubbedUpstreams:
+    """
+    Replacement for requests.get that answers from the benchmark stubs and
+    counts calls per upstream. CoinGecko enforces a per-minute rate limit so
+    the crypto_cache 429 cooldown is exercised like in production.
+    """
+
+    def __init__(self, clock: VirtualClock, coingecko_per_minute: int):
+        self.clock = clock
+        self.coingecko_per_minute = coingecko_per_minute
+        self.calls = {name: 0 for name in list(SIM_HOSTS.values()) + ["nextcloud"]}
+        self.rate_limited = {name: 0 for name in self.calls}
+        self._coingecko_window = []
+        self._routes = {
+            "openweather": stubs.openweather_route(),
+            "coingecko": stubs.coingecko_route(coin_list_size=100),
+            "calendar": stubs.ics_route(event_count=20),
+            "merriam-webster": stubs.rss_route(item_count=3),
+        }
+
+    def get(self, url, params=None, **kwargs):
+        parsed = urlparse(url)
+        upstream = SIM_HOSTS.get(parsed.netloc)
+        if upstream is None:
+            raise requests.ConnectionError(f"Unexpected upstream in simulation: {url}")
+        self.calls[upstream] += 1
+
+        if upstream == "coingecko" and self.coingecko_per_minute:
+            window_start = self.clock.time() - 60
+            self._coingecko_window = [t for t in self._coingecko_window if t > window_start]
+            if len(self._coingecko_window) >= self.coingecko_per_minute:
+                self.rate_limited[upstream] += 1
+                return _SimResponse(429, b'{"error": "Too Many Requests"}')
+            self._coingecko_window.append(self.clock.time())
+
+        query = {key: [str(value)] for key, value in (params or {}).items()}
+        status, _, body = self._routes[upstream]("GET", parsed.path, query, b"")
+        return _SimResponse(status, body)
+
+    def fake_nextcloud(self):
+        """Fake nc_py_api client counting listdir and download calls."""
+        upstreams = self
+
+        def listdir(folder_path):
+            upstreams.calls["nextcloud"] += 1
+            return [SimpleNamespace(name=f"photo-{i}.jpg", is_dir=False, etag=f"etag-{i}",
+                                    info=SimpleNamespace(size=1026)) for i in range(10)]
+
+        def download2stream(file_path, fp):
+            upstreams.calls["nextcloud"] += 1
+            fp.write(b"\xff\xd8" + b"\0" * 1024)
+
+        return SimpleNamespace(files=SimpleNamespace(listdir=listdir, download2stream=download2stream))
+
+
+class Frame:
+    """Client-side state of one frame, mirroring the JS modules."""
+
+    def __init__(self, frame_id: int, coin_ids: list):
+        self.frame_id = frame_id
+        self.coin_ids = coin_ids
+        # Photos are served as immutable, so the browser cache keeps them across reloads
+        self.cached_photos = set()
+        self.reset()
+
+    def reset(self):
+        self.coin_index = 0
+        self.price_cached_at = None
+        self.chart_cached_at = {}
+        self.chart_coin = None
+
+
+def simulate(args) -> dict:
+    start = 1_700_000_000.0 - (1_700_000_000.0 % DAY)  # midnight UTC
+    clock = VirtualClock(start)
+    upstreams = StubbedUpstreams(clock, args.coingecko_per_minute)
+
+    settings.openweather_api_key = "sim"
+    settings.openweather_base_url = "http://openweather.sim"
+    settings.crypto_api = "sim"
+    settings.coingecko_base_url = "http://coingecko.sim"
+    settings.calendar_ical_url = "http://calendar.sim/personal.ics"
+    settings.calendar_holidays_url = "http://calendar.sim/holidays.ics"
+    settings.calendar_garbage_url = "http://calendar.sim/garbage.ics"
+    settings.daily_word_feed_url = "http://merriam-webster.sim/wotd/feed/rss2"
+    settings.nextcloud_folder = "/Photos/"
+    settings.snapshot_path = ""
+
+    import app.main as app_main
+    from app.main import app
+
+    client = app.test_client()
+    coin_ids = [c.strip() for c in settings.crypto_coin_ids.split(",") if c.strip()]
+    frames = [Frame(i, coin_ids) for i in range(args.frames)]
+    end = start + args.hours * 3600
+    requests_per_path = {}
+
+    def call(path, report_as=None):
+        report_as = report_as or path
+        requests_per_path[report_as] = requests_per_path.get(report_as, 0) + 1
+        # Closing the response frees its admission slot, as a WSGI server does
+        with client.get(path) as response:
+            if response.status_code == 503:
+                raise RuntimeError(f"{path} was shed by admission control; the simulation would undercount upstream calls")
+            return response.get_json(silent=True)
+
+    def background_tick(frame):
+        """One tick of background.js; returns the seconds until the next one."""
+        playlist = call(f"/api/background/playlist?count={BACKGROUND_PLAYLIST_COUNT}",
+                        "/api/background/playlist") or {}
+        items = playlist.get("items", [])
+        due = [item for item in items if item["show_at"] <= clock.now]
+        upcoming = next((item for item in items if item["show_at"] > clock.now), None)
+        # The due photo is shown and the upcoming one preloaded, each downloaded once per frame
+        for item in (due[-1] if due else (items[0] if items else None), upcoming):
+            if item is not None and item["id"] not in frame.cached_photos:
+                call(item["url"], "/api/background/<id>")
+                frame.cached_photos.add(item["id"])
+        if upcoming is None:
+            return BACKGROUND_RETRY_INTERVAL
+        return max(upcoming["show_at"] - clock.now, 1)
+
+    def load_chart(frame, coin_id):
+        if frame.chart_coin == coin_id:
+            return
+        cached_at = frame.chart_cached_at.get(coin_id)
+        if cached_at is None or clock.now - cached_at >= CLIENT_CHART_CACHE:
+            call(f"/api/crypto-history/{coin_id}")
+            frame.chart_cached_at[coin_id] = clock.now
+        frame.chart_coin = coin_id
+
+    def crypto_update(frame):
+        if frame.price_cached_at is None or clock.now - frame.price_cached_at >= CLIENT_PRICE_CACHE:
+            call("/api/crypto-price")
+            frame.price_cached_at = clock.now
+        frame.coin_index = 0
+        load_chart(frame, frame.coin_ids[0])
+
+    def page_load(frame):
+        frame.reset()
+        for path in ("/", "/api/crypto-config", "/daily-word", "/api/calendar",
+                     "/api/weather/first-city", "/api/forecast/first-city",
+                     "/api/weather/second-city", "/api/forecast/second-city"):
+            call(path)
+        crypto_update(frame)
+
+    handlers = {
+        "load": page_load,
+        "weather": lambda f: [call(p) for p in ("/api/weather/first-city", "/api/forecast/first-city",
+                                                "/api/weather/second-city", "/api/forecast/second-city")],
+        "calendar": lambda f: call("/api/calendar"),
+        "crypto": crypto_update,
+        "rotate": lambda f: (
+            setattr(f, "coin_index", (f.coin_index + 1) % len(f.coin_ids)),
+            load_chart(f, f.coin_ids[f.coin_index]),
+        ),
+        "daily-word": lambda f: call("/daily-word"),
+        "background": background_tick,
+    }
+    intervals = {
+        "weather": WEATHER_INTERVAL,
+        "calendar": CALENDAR_INTERVAL,
+        "crypto": CRYPTO_INTERVAL,
+        "rotate": CRYPTO_ROTATION_INTERVAL,
+        "daily-word": DAY,
+        "load": args.reload_hours * 3600,
+        # Each tick waits for the next slot of the playlist it got
+        "background": None,
+    }
+
+    rng = random.Random(args.seed)
+    queue = []
+    for frame in frames:
+        boot = start + rng.uniform(0, args.stagger_seconds)
+        heapq.heappush(queue, (boot, frame.frame_id, "load"))
+        heapq.heappush(queue, (boot, frame.frame_id, "background"))
+        for event in ("weather", "calendar", "crypto", "rotate"):
+            heapq.heappush(queue, (boot + intervals[event], frame.frame_id, event))
+        heapq.heappush(queue, (start + DAY, frame.frame_id, "daily-word"))
+
+    with mock.patch.object(crypto_cache, "time", SimpleNamespace(time=clock.time)), \
+            mock.patch.object(snapshot, "time", SimpleNamespace(time=clock.time)), \
+            mock.patch.object(daily_word, "time", SimpleNamespace(time=clock.time)), \
+            mock.patch.object(app_main, "time", SimpleNamespace(time=clock.time)), \
+            mock.patch.object(requests, "get", upstreams.get), \
+            mock.patch.object(nextcloud, "connect_to_nextcloud", upstreams.fake_nextcloud):
+        with crypto_cache._cache_lock:
+            crypto_cache._cache.clear()
+            crypto_cache._rate_limit_errors.clear()
+        with snapshot._snapshot_lock:
+            snapshot._snapshots.clear()
+        while queue and queue[0][0] < end:
+            at, frame_id, event = heapq.heappop(queue)
+            clock.now = at
+            wait = handlers[event](frames[frame_id])
+            heapq.heappush(queue, (at + (intervals[event] or wait), frame_id, event))
+
+    days = args.hours / 24
+    per_day = {name: round(count / days, 1) for name, count in upstreams.calls.items()}
+    return {
+        "config": vars(args),
+        "upstream_calls_per_day": per_day,
+        "rate_limited_per_day": {
+            name: round(count / days, 1) for name, count in upstreams.rate_limited.items() if count
+        },
+        "quota_usage": {
+            name: round(per_day[name] / quota, 3) for name, quota in DEFAULT_QUOTAS.items()
+        },
+        "frame_requests_per_day": {
+            path: round(count / days, 1) for path, count in sorted(requests_per_path.items())
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate upstream API usage of polling frames")
+    parser.add_argument("--frames", type=int, default=1, help="number of frames polling the server")
+    parser.add_argument("--hours", type=float, default=24, help="simulated time span")
+    parser.add_argument("--reload-hours", type=float, default=24, help="page reload (reboot) interval")
+    parser.add_argument("--stagger-seconds", type=float, default=300, help="spread of frame boot times")
+    parser.add_argument("--coingecko-per-minute", type=int, default=30,
+                        help="CoinGecko rate limit to simulate (0 disables)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="optional path for the JSON report")
+    args = parser.parse_args()
+
+    report = simulate(args)
+
+    print(f"{'upstream':<18}{'calls/day':>12}{'429s/day':>12}{'quota':>10}")
+    for name, calls in report["upstream_calls_per_day"].items():
+        quota = report["quota_usage"].get(name)
+        quota_txt = f"{quota:.0%}" if quota is not None else "-"
+        print(f"{name:<18}{calls:>12}{report['rate_limited_per_day'].get(name, 0):>12}{quota_txt:>10}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
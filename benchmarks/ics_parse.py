@@ -0,0 +1,102 @@
+"""
+Benchmark the calendar feed parsers on large ICS files.
+
+Compares the previous path (`ics.Calendar(text)`, then filtering and sorting
+every event) with the line-oriented scanner in app/modules/ics_scanner.py on
+generated feeds with mostly past events, and checks that both return the
+same upcoming events.
+
+Usage:
+    python -m benchmarks.ics_parse --events 500,2000,5000 --repeat 3
+"""
+import argparse
+import io
+import json
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from app.modules import ics_scanner
+from benchmarks import stubs
+
+MAX_EVENTS = 5
+
+
+def parse_with_ics(data: bytes, start_of_today: datetime) -> list:
+    """The calendar module's parsing before the scanner, including its filtering."""
+    from ics import Calendar
+
+    calendar = Calendar(data.decode("utf-8", errors="replace"))
+    events = []
+    for event in sorted(calendar.events, key=lambda e: e.begin):
+        if len(events) >= MAX_EVENTS:
+            break
+        event_begin = event.begin.datetime
+        if event_begin.tzinfo is None:
+            event_begin = event_begin.replace(tzinfo=timezone.utc)
+        if event_begin >= start_of_today:
+            events.append((event.name, event.begin.datetime.isoformat()))
+    return events
+
+
+def parse_with_scanner(data: bytes, start_of_today: datetime) -> list:
+    upcoming = ics_scanner.upcoming_events(io.BytesIO(data), start_of_today, MAX_EVENTS, timezone.utc)
+    return [(item["name"], item["begin"].isoformat()) for item in upcoming]
+
+
+def measure(parse, data: bytes, start_of_today: datetime, repeat: int) -> dict:
+    """Median wall time and peak traced memory of a parser."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = parse(data, start_of_today)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    parse(data, start_of_today)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "median_ms": round(statistics.median(timings) * 1000, 2),
+        "peak_kb": round(peak / 1024, 1),
+        "result": result,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare ICS parsing paths on large feeds")
+    parser.add_argument("--events", default="500,2000,5000", help="comma-separated VEVENT counts")
+    parser.add_argument("--future-share", type=float, default=0.02, help="fraction of upcoming events")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="optional path for the JSON report")
+    args = parser.parse_args()
+
+    start_of_today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    # Import and compile the ics grammar before timing anything
+    parse_with_ics(stubs.build_ics(1).encode(), start_of_today)
+
+    report = []
+    print(f"{'events':>8}{'bytes':>12}{'ics ms':>10}{'scan ms':>10}{'speedup':>9}"
+          f"{'ics KB':>10}{'scan KB':>10}  same")
+    for count in [int(value) for value in args.events.split(",")]:
+        data = stubs.build_ics(count, args.future_share).encode()
+        ics_result = measure(parse_with_ics, data, start_of_today, args.repeat)
+        scan_result = measure(parse_with_scanner, data, start_of_today, args.repeat)
+        same = ics_result.pop("result") == scan_result.pop("result")
+        speedup = ics_result["median_ms"] / max(scan_result["median_ms"], 0.01)
+        report.append({
+            "events": count, "bytes": len(data), "ics": ics_result, "scanner": scan_result,
+            "speedup": round(speedup, 1), "same_result": same,
+        })
+        print(f"{count:>8}{len(data):>12,}{ics_result['median_ms']:>10}{scan_result['median_ms']:>10}"
+              f"{speedup:>8.1f}x{ics_result['peak_kb']:>10}{scan_result['peak_kb']:>10}  {'yes' if same else 'NO'}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
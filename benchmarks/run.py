@@ -0,0 +1,249 @@
+"""
+Benchmark the frame's Flask routes against local stub upstreams.
+
+Starts stand-ins for OpenWeather, CoinGecko (API and logo CDN), the ICS
+feeds, the Merriam-Webster RSS feed and Nextcloud WebDAV, points the
+settings at them, serves the app on a local port and drives every route at the
+requested concurrency levels. Results are written as JSON.
+
+Usage:
+    python -m benchmarks.run --concurrency 1,4,8 --requests 200 --latency-ms 50
+"""
+import argparse
+import json
+import logging
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+import requests
+from werkzeug.serving import make_server
+
+from app.config.config import settings
+from app.modules import crypto_cache
+from benchmarks import stubs
+
+NEXTCLOUD_USER = "bench"
+NEXTCLOUD_FOLDER = "/Photos/"
+
+ROUTES = [
+    "/api/weather/first-city",
+    "/api/forecast/first-city",
+    "/api/weather/second-city",
+    "/api/forecast/second-city",
+    "/api/calendar",
+    "/api/crypto-price",
+    "/api/crypto-history/bitcoin",
+    "/api/crypto-config",
+    "/api/crypto-sparkline/bitcoin.svg?w=300&h=120",
+    "/daily-word",
+    "/api/background",
+    "/api/background/playlist?count=3",
+    # Placeholders are filled in by fill_routes once the stubs and the app run
+    "/api/background/{photo_id}",
+    "/api/asset-proxy?url={logo_url}&w=80",
+    "/api/asset-proxy/{logo_name}",
+]
+
+
+def start_stubs(args) -> dict:
+    """Start all stub upstreams and point the settings at them."""
+    servers = {
+        "openweather": stubs.StubServer(
+            "openweather", stubs.openweather_route(args.forecast_entries), args.latency_ms),
+        "coingecko": stubs.StubServer(
+            "coingecko", stubs.coingecko_route(args.coin_list_size), args.latency_ms),
+        "calendar": stubs.StubServer(
+            "calendar", stubs.ics_route(args.ics_events), args.latency_ms),
+        "merriam-webster": stubs.StubServer(
+            "merriam-webster", stubs.rss_route(), args.latency_ms),
+        "coin-logos": stubs.StubServer(
+            "coin-logos", stubs.logo_route(), args.latency_ms),
+        "nextcloud": stubs.StubServer(
+            "nextcloud",
+            stubs.nextcloud_route(NEXTCLOUD_USER, NEXTCLOUD_FOLDER, image_bytes=args.image_bytes),
+            args.latency_ms),
+    }
+    for server in servers.values():
+        server.start()
+
+    settings.openweather_api_key = "bench"
+    settings.openweather_base_url = servers["openweather"].base_url
+    settings.crypto_api = "bench"
+    settings.coingecko_base_url = servers["coingecko"].base_url
+    settings.asset_proxy_hosts = "127.0.0.1"
+    settings.asset_proxy_dir = tempfile.mkdtemp(prefix="bench-assets-")
+    calendar_url = f"{servers['calendar'].base_url}/basic.ics"
+    settings.calendar_ical_url = calendar_url
+    settings.calendar_holidays_url = calendar_url
+    settings.calendar_garbage_url = calendar_url
+    settings.daily_word_feed_url = f"{servers['merriam-webster'].base_url}/wotd/feed/rss2"
+    settings.nextcloud_url = servers["nextcloud"].base_url
+    settings.nextcloud_user = NEXTCLOUD_USER
+    settings.nextcloud_password = "bench"
+    settings.nextcloud_folder = NEXTCLOUD_FOLDER
+    settings.snapshot_path = ""
+    return servers
+
+
+def start_app():
+    """Serve the Flask app on a free local port in a background thread."""
+    from app.main import app
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def fill_routes(routes: list, base_url: str, servers: dict) -> list:
+    """
+    Fill in the placeholders of routes whose URLs only exist at runtime.
+
+    Args:
+        routes: Routes, possibly containing {photo_id}, {logo_url} or {logo_name}
+        base_url: Base URL of the running app
+        servers: Running stub servers by name
+
+    Returns:
+        The routes with real ids and URLs
+    """
+    logo_url = f"{servers['coin-logos'].base_url}/coins/images/1/small/bitcoin.png"
+    values = {"logo_url": quote(logo_url, safe="")}
+    if any("{photo_id}" in route for route in routes):
+        playlist = requests.get(f"{base_url}/api/background/playlist?count=1", timeout=30).json()
+        values["photo_id"] = playlist["items"][0]["id"]
+    if any("{logo_name}" in route for route in routes):
+        # The first request stores the logo; its redirect names the stored file
+        resp = requests.get(f"{base_url}/api/asset-proxy?url={values['logo_url']}&w=80",
+                            allow_redirects=False, timeout=30)
+        values["logo_name"] = resp.headers["Location"].rsplit("/", 1)[-1]
+    return [route.format(**values) for route in routes]
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def run_route(base_url: str, route: str, concurrency: int, total_requests: int) -> dict:
+    """
+    Drive one route with a fixed number of concurrent workers.
+
+    Returns:
+        Dictionary with latency percentiles (ms), throughput and status counts
+    """
+    local = threading.local()
+
+    def one_request(_):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            resp = local.session.get(base_url + route, timeout=30)
+            status = resp.status_code
+        except requests.RequestException:
+            status = 0
+        return time.perf_counter() - start, status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(one_request, range(total_requests)))
+    wall = time.perf_counter() - started
+
+    latencies = [s[0] * 1000 for s in samples]
+    statuses = {}
+    for _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        "route": route,
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+        "throughput_rps": round(total_requests / wall, 2) if wall else 0.0,
+        "statuses": statuses,
+    }
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark frame routes against stub upstreams")
+    parser.add_argument("--concurrency", default="1,4,8", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=100, help="requests per route and level")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="stub upstream latency")
+    parser.add_argument("--routes", default=",".join(ROUTES), help="comma-separated routes to run")
+    parser.add_argument("--ics-events", type=int, default=200, help="VEVENTs per ICS feed")
+    parser.add_argument("--forecast-entries", type=int, default=40, help="entries in forecast payload")
+    parser.add_argument("--coin-list-size", type=int, default=15000, help="entries in coin list payload")
+    parser.add_argument("--image-bytes", type=int, default=500_000, help="size of each stub photo")
+    parser.add_argument("--cold", action="store_true", help="clear the crypto cache before each run")
+    parser.add_argument("--output", default="bench_output.json", help="where to write JSON results")
+    args = parser.parse_args()
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    servers = start_stubs(args)
+    app_server, base_url = start_app()
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    routes = fill_routes([route.strip() for route in args.routes.split(",") if route.strip()],
+                         base_url, servers)
+
+    results = []
+    try:
+        for route in routes:
+            for concurrency in levels:
+                if args.cold:
+                    with crypto_cache._cache_lock:
+                        crypto_cache._cache.clear()
+                before = {name: server.request_count for name, server in servers.items()}
+                result = run_route(base_url, route, concurrency, args.requests)
+                result["upstream_calls"] = {
+                    name: server.request_count - before[name] for name, server in servers.items()
+                    if server.request_count != before[name]
+                }
+                results.append(result)
+                print(
+                    f"{route:<32} c={concurrency:<3} p50={result['p50_ms']:>8.1f}ms "
+                    f"p95={result['p95_ms']:>8.1f}ms p99={result['p99_ms']:>8.1f}ms "
+                    f"{result['throughput_rps']:>8.1f} req/s"
+                )
+    finally:
+        app_server.shutdown()
+        for server in servers.values():
+            server.stop()
+        shutil.rmtree(settings.asset_proxy_dir, ignore_errors=True)
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
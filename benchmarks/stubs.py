@@ -0,0 +1,268 @@
+"""
+Local stand-ins for the upstream services used by the frame.
+Each stub runs its own HTTP server on localhost with a configurable
+response latency and payload size, so benchmarks don't depend on (or
+hammer) the real APIs.
+"""
+import json
+import random
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote
+
+
+class StubServer:
+    """
+    Threaded HTTP server that answers every request through a route function.
+
+    Args:
+        name: Upstream name, used in reports
+        route: Function (method, path, query, body) -> (status, content_type, body_bytes)
+        latency_ms: Artificial delay added before every response
+    """
+
+    def __init__(self, name: str, route, latency_ms: float = 0.0):
+        self.name = name
+        self.route = route
+        self.latency_ms = latency_ms
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _handle(self):
+                with stub._count_lock:
+                    stub.request_count += 1
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                parsed = urlparse(self.path)
+                if stub.latency_ms:
+                    time.sleep(stub.latency_ms / 1000)
+                status, content_type, payload = stub.route(
+                    self.command, unquote(parsed.path), parse_qs(parsed.query), body
+                )
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = _handle
+            do_PROPFIND = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _json(data, status: int = 200):
+    return status, "application/json", json.dumps(data).encode()
+
+
+#OPENWEATHER -----------------------------------------------------------------------
+def openweather_route(forecast_entries: int = 40):
+    def route(method, path, query, body):
+        now = int(time.time())
+        if path.endswith("/data/2.5/weather"):
+            return _json({
+                "name": "Stubtown",
+                "main": {"temp": 12.3, "feels_like": 11.0},
+                "weather": [{"icon": "02d", "description": "few clouds"}],
+                "sys": {"sunrise": now - 3600, "sunset": now + 3600},
+                "wind": {"speed": 3.4},
+                "rain": {"1h": 0.2},
+            })
+        if path.endswith("/data/2.5/forecast"):
+            return _json({"list": [
+                {
+                    "dt": now + i * 10800,
+                    "main": {"temp": 10 + (i % 8)},
+                    "weather": [{"description": "light rain", "icon": "10d"}],
+                }
+                for i in range(forecast_entries)
+            ]})
+        return _json({"message": "not found"}, 404)
+    return route
+
+
+#COINGECKO -----------------------------------------------------------------------
+def coingecko_route(coin_list_size: int = 15000):
+    coin_list = [{"id": f"coin-{i}", "symbol": f"c{i}", "name": f"Coin {i}"} for i in range(coin_list_size)]
+
+    def route(method, path, query, body):
+        if path.endswith("/simple/price"):
+            ids = query.get("ids", [""])[0].split(",")
+            return _json({coin_id: {"usd": random.uniform(1, 60000)} for coin_id in ids if coin_id})
+        if path.endswith("/coins/list"):
+            return _json(coin_list)
+        if path.endswith("/market_chart"):
+            days = int(query.get("days", ["30"])[0])
+            now_ms = int(time.time() * 1000)
+            return _json({"prices": [
+                [now_ms - (days - i) * 86400000, random.uniform(1, 60000)] for i in range(days + 1)
+            ]})
+        return _json({"error": "not found"}, 404)
+    return route
+
+
+#ICS FEEDS -----------------------------------------------------------------------
+def build_ics(event_count: int = 500, future_share: float = 0.1) -> str:
+    """
+    Build an ICS feed with mostly past and some future events.
+
+    Args:
+        event_count: Number of VEVENTs in the feed
+        future_share: Fraction of events that start in the future
+    """
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    future_count = int(event_count * future_share)
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//frame-bench//stub//EN"]
+    for i in range(event_count):
+        if i < event_count - future_count:
+            begin = now - timedelta(days=event_count - i)
+        else:
+            begin = now + timedelta(days=i - (event_count - future_count) + 1)
+        end = begin + timedelta(hours=1)
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:stub-{i}@frame-bench",
+            f"DTSTAMP:{now.strftime('%Y%m%dT%H%M%SZ')}",
+            f"DTSTART:{begin.strftime('%Y%m%dT%H%M%SZ')}",
+            f"DTEND:{end.strftime('%Y%m%dT%H%M%SZ')}",
+            f"SUMMARY:Stub event {i}",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(lines) + "\r\n"
+
+
+def ics_route(event_count: int = 500):
+    feed = build_ics(event_count).encode()
+
+    def route(method, path, query, body):
+        return 200, "text/calendar", feed
+    return route
+
+
+#MERRIAM-WEBSTER RSS -----------------------------------------------------------------------
+def build_rss(item_count: int = 20) -> str:
+    items = "".join(
+        f"<item><title>word{i}</title>"
+        f"<merriam:shortdef>definition of word {i}</merriam:shortdef>"
+        f"<description>{'lorem ipsum ' * 50}</description></item>"
+        for i in range(item_count)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<rss version="2.0" xmlns:merriam="http://www.merriam-webster.com/2006/rss">'
+        f"<channel><title>Word of the Day</title>{items}</channel></rss>"
+    )
+
+
+def rss_route(item_count: int = 20):
+    feed = build_rss(item_count).encode()
+
+    def route(method, path, query, body):
+        return 200, "application/rss+xml", feed
+    return route
+
+
+#COIN LOGOS -----------------------------------------------------------------------
+def build_png(size: int = 250) -> bytes:
+    """Square grayscale PNG of noise, about the size of a CoinGecko "small" logo."""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    rows = b"".join(b"\0" + bytes(random.getrandbits(8) for _ in range(size)) for _ in range(size))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 0, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(rows))
+        + chunk(b"IEND", b"")
+    )
+
+
+def logo_route(size: int = 250):
+    logo = build_png(size)
+
+    def route(method, path, query, body):
+        if path.endswith(".png"):
+            return 200, "image/png", logo
+        return _json({"error": "not found"}, 404)
+    return route
+
+
+#NEXTCLOUD WEBDAV -----------------------------------------------------------------------
+def nextcloud_route(user: str, folder: str, image_count: int = 50, image_bytes: int = 500_000):
+    folder = "/" + folder.strip("/")
+    image = bytes(random.getrandbits(8) for _ in range(1024)) * (image_bytes // 1024 + 1)
+    image = image[:image_bytes]
+    names = [f"photo-{i}.jpg" for i in range(image_count)]
+    dav_root = f"/remote.php/dav/files/{user}"
+
+    def propfind_entry(href: str, is_dir: bool, size: int, file_id: int) -> str:
+        resourcetype = "<d:collection/>" if is_dir else ""
+        return (
+            f"<d:response><d:href>{href}</d:href><d:propstat><d:prop>"
+            f"<d:resourcetype>{resourcetype}</d:resourcetype>"
+            f"<d:getcontentlength>{size}</d:getcontentlength>"
+            f"<oc:size>{size}</oc:size><oc:fileid>{file_id}</oc:fileid>"
+            f"<oc:id>{file_id:08d}ocstub</oc:id>"
+            f"<d:getetag>\"stub\"</d:getetag>"
+            f"<d:getlastmodified>Mon, 01 Jan 2024 00:00:00 GMT</d:getlastmodified>"
+            f"</d:prop><d:status>HTTP/1.1 200 OK</d:status></d:propstat></d:response>"
+        )
+
+    def ocs(data):
+        return _json({"ocs": {"meta": {"status": "ok", "statuscode": 100, "message": "OK"}, "data": data}})
+
+    def route(method, path, query, body):
+        if path.startswith("/ocs/v1.php/cloud/capabilities"):
+            return ocs({
+                "version": {"major": 30, "minor": 0, "micro": 0, "string": "30.0.0"},
+                "capabilities": {},
+            })
+        if path.startswith("/ocs/v1.php/cloud/user"):
+            return ocs({"id": user})
+        if method == "PROPFIND":
+            entries = [propfind_entry(f"{dav_root}{folder}/", True, 0, 1)]
+            entries += [
+                propfind_entry(f"{dav_root}{folder}/{name}", False, image_bytes, i + 2)
+                for i, name in enumerate(names)
+            ]
+            xml = (
+                '<?xml version="1.0"?><d:multistatus xmlns:d="DAV:" '
+                'xmlns:oc="http://owncloud.org/ns" xmlns:nc="http://nextcloud.org/ns">'
+                + "".join(entries) + "</d:multistatus>"
+            )
+            return 207, "application/xml; charset=utf-8", xml.encode()
+        if method == "GET" and path.startswith(dav_root):
+            return 200, "image/jpeg", image
+        return _json({"error": "not found"}, 404)
+    return route